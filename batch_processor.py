@@ -5,18 +5,19 @@
 
 import os
 import sys
-import time
 import logging
-from typing import List, Dict, Tuple
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Dict, Tuple, Optional, Set
 
 # 환경 설정
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from supabase import create_client
-from sentence_transformers import SentenceTransformer
 import openai
 
+from data_collector import TokenBucket, build_raw_row, upsert_raw_rows
+from embedding_utils import load_embedding_model
+from supabase_utils import get_supabase_client
+
 # 로깅 설정
 logging.basicConfig(
     level=logging.INFO,
@@ -28,126 +29,244 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# raw_product_data 일괄 insert 청크 크기
+BATCH_SIZE = 500
+
+# 기존 제품 조회 시 한 요청에 담는 제품명 수 (한글 제품명은 URL 인코딩 후 약 100자씩이라 8KB 이내로 유지)
+EXISTING_LOOKUP_CHUNK_SIZE = 50
+
+# 제품 단위 병렬 처리 작업 스레드 수
+MAX_WORKERS = 8
+
+# OpenAI 초당 호출 한도 (작업 스레드 전체가 공유)
+OPENAI_RATE_PER_SEC = 5
+
+openai_rate_limiter = TokenBucket(OPENAI_RATE_PER_SEC, OPENAI_RATE_PER_SEC)
+
 class BatchProcessor:
     def __init__(self):
         """배치 프로세서 초기화"""
-        self.supabase = create_client(
-            os.environ.get("SUPABASE_URL"),
-            os.environ.get("SUPABASE_KEY")
-        )
+        # 프로세스 공용 클라이언트 (커넥션 풀 공유)
+        self.supabase = get_supabase_client()
         
         openai.api_key = os.environ.get("OPENAI_API_KEY")
         
-        # 임베딩 모델 로드
-        try:
-            self.embedding_model = SentenceTransformer('jhgan/ko-sroberta-multitask')
-        except:
-            self.embedding_model = SentenceTransformer('paraphrase-multilingual-MiniLM-L12-v2')
-        
-        logger.info("배치 프로세서 초기화 완료")
-    
-    def process_product_batch(self, products: List[Tuple[str, int]]) -> Dict:
-        """제품 배치 처리"""
-        logger.info(f"배치 처리 시작: {len(products)}개 제품")
-        
-        results = {
-            "total_products": len(products),
-            "successful": 0,
-            "failed": 0,
-            "details": []
-        }
+        # 임베딩 모델 로드 (프로세스 내 인스턴스 간 공유)
+        self.embedding_model = load_embedding_model()
         
-        # 데이터 수집기와 QA 생성기 임포트 (실제 사용시 주석 해제)
+        # 데이터 수집기와 QA 생성기 (실제 사용시 주석 해제, 모든 작업 스레드가 공유)
         # from data_collector import NaverDataCollector
         # from qa_generator import QAGenerator
         
-        # collector = NaverDataCollector(
+        # self.collector = NaverDataCollector(
         #     client_id=os.environ.get("NAVER_CLIENT_ID"),
         #     client_secret=os.environ.get("NAVER_CLIENT_SECRET"),
         #     supabase_client=self.supabase
         # )
         
-        # qa_generator = QAGenerator(
+        # self.qa_generator = QAGenerator(
         #     openai_api_key=os.environ.get("OPENAI_API_KEY"),
         #     supabase_client=self.supabase,
         #     embedding_model=self.embedding_model
         # )
         
-        for i, (product_name, category_id) in enumerate(products, 1):
-            try:
-                logger.info(f"처리 중 ({i}/{len(products)}): {product_name}")
-                
-                # 1. 데이터 수집
-                logger.info(f"  1단계: 데이터 수집 중...")
-                # raw_data = collector.collect_product_data(product_name, category_id)
-                
-                # 시뮬레이션용 (실제 사용시 제거)
-                raw_data = self.simulate_data_collection(product_name, category_id)
+        logger.info("배치 프로세서 초기화 완료")
+    
+    def process_product_batch(self, products: List[Tuple[str, int]], skip_existing: bool = False) -> Dict:
+        """제품 배치 처리 (skip_existing이면 이미 수집된 제품은 수집/QA 생성 생략)"""
+        logger.info(f"배치 처리 시작: {len(products)}개 제품")
+        
+        results = {
+            "total_products": len(products),
+            "successful": 0,
+            "failed": 0,
+            "skipped": 0,
+            "details": []
+        }
+        
+        # 0단계: 이미 저장된 제품 제외 (한 번의 조회로 확인)
+        if skip_existing:
+            existing = self.find_existing_products(products)
+            if existing:
+                logger.info(f"이미 수집된 제품 {len(existing)}개 건너뜀")
+                results["skipped"] = sum(1 for product in products if product in existing)
+                products = [product for product in products if product not in existing]
+        
+        # 1단계: 데이터 수집 (제품별 병렬 처리, DB 저장은 2단계에서 일괄 처리)
+        collected = []
+        
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            futures = [
+                executor.submit(self.collect_one, product_name, category_id)
+                for product_name, category_id in products
+            ]
+            
+            for i, future in enumerate(as_completed(futures), 1):
+                detail = future.result()
+                logger.info(f"수집 진행 ({i}/{len(products)}): {detail['product']}")
                 
-                if not raw_data or raw_data.get('total_source_count', 0) < 5:
-                    logger.warning(f"  데이터 수집 실패 또는 데이터 부족: {product_name}")
+                if detail["status"] == "collected":
+                    collected.append(detail["raw_data"])
+                else:
                     results["failed"] += 1
-                    results["details"].append({
-                        "product": product_name,
-                        "status": "failed",
-                        "reason": "데이터 수집 실패"
-                    })
-                    continue
-                
-                logger.info(f"  데이터 수집 완료: {raw_data['total_source_count']}개 소스")
-                
-                # 2. QA 생성
-                logger.info(f"  2단계: QA 생성 중...")
-                # qa_list = qa_generator.generate_qa_from_raw_data(raw_data['raw_data_id'])
-                
-                # 시뮬레이션용 (실제 사용시 제거)
-                qa_list = self.simulate_qa_generation(raw_data['raw_data_id'])
+                    results["details"].append(detail)
+        
+        # 2단계: 원본 데이터 일괄 저장 (BATCH_SIZE 단위)
+        logger.info(f"원본 데이터 일괄 저장 중: {len(collected)}개")
+        for start in range(0, len(collected), BATCH_SIZE):
+            chunk = collected[start:start + BATCH_SIZE]
+            raw_data_ids = self.save_raw_data_bulk(chunk)
+            for raw_data, raw_data_id in zip(chunk, raw_data_ids):
+                raw_data['raw_data_id'] = raw_data_id
+        
+        # 3단계: QA 생성 (제품별 병렬 처리)
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            futures = [executor.submit(self.generate_qa_one, raw_data) for raw_data in collected]
+            
+            for future in as_completed(futures):
+                detail = future.result()
                 
-                if not qa_list:
-                    logger.warning(f"  QA 생성 실패: {product_name}")
+                if detail["status"] == "success":
+                    results["successful"] += 1
+                else:
                     results["failed"] += 1
-                    results["details"].append({
-                        "product": product_name,
-                        "status": "failed",
-                        "reason": "QA 생성 실패"
-                    })
-                    continue
-                
-                logger.info(f"  QA 생성 완료: {len(qa_list)}개")
-                
-                # 성공 기록
-                results["successful"] += 1
-                results["details"].append({
-                    "product": product_name,
-                    "status": "success",
-                    "raw_data_id": raw_data.get('raw_data_id'),
-                    "qa_count": len(qa_list),
-                    "data_quality": raw_data.get('data_quality_score', 0)
-                })
-                
-                # API 호출 제한 고려 (1초 대기)
-                time.sleep(1)
-                
-            except Exception as e:
-                logger.error(f"제품 처리 실패: {product_name} - {str(e)}")
-                results["failed"] += 1
-                results["details"].append({
-                    "product": product_name,
-                    "status": "error",
-                    "reason": str(e)
-                })
-                continue
+                results["details"].append(detail)
         
         logger.info(f"배치 처리 완료: 성공 {results['successful']}개, 실패 {results['failed']}개")
         return results
     
+    def collect_one(self, product_name: str, category_id: int) -> Dict:
+        """단일 제품 데이터 수집 (작업 스레드에서 실행, 처리 상세 반환)"""
+        try:
+            logger.info(f"수집 중: {product_name}")
+            
+            # raw_data = self.collector.collect_product_data(product_name, category_id, save=False)
+            
+            # 시뮬레이션용 (실제 사용시 제거)
+            raw_data = self.simulate_data_collection(product_name, category_id)
+            
+            if not raw_data or raw_data.get('total_source_count', 0) < 5:
+                logger.warning(f"  데이터 수집 실패 또는 데이터 부족: {product_name}")
+                return {
+                    "product": product_name,
+                    "status": "failed",
+                    "reason": "데이터 수집 실패"
+                }
+            
+            logger.info(f"  데이터 수집 완료: {product_name}, {raw_data['total_source_count']}개 소스")
+            return {
+                "product": product_name,
+                "status": "collected",
+                "raw_data": raw_data
+            }
+            
+        except Exception as e:
+            logger.error(f"제품 처리 실패: {product_name} - {str(e)}")
+            return {
+                "product": product_name,
+                "status": "error",
+                "reason": str(e)
+            }
+    
+    def generate_qa_one(self, raw_data: Dict) -> Dict:
+        """단일 제품 QA 생성 (작업 스레드에서 실행, 처리 상세 반환)"""
+        product_name = raw_data['product_name']
+        
+        try:
+            if not raw_data.get('raw_data_id'):
+                logger.warning(f"  원본 데이터 저장 실패: {product_name}")
+                return {
+                    "product": product_name,
+                    "status": "failed",
+                    "reason": "원본 데이터 저장 실패"
+                }
+            
+            logger.info(f"QA 생성 중: {product_name}")
+            
+            # 고정 대기 대신 호출 단위로 OpenAI 호출 제한 적용
+            openai_rate_limiter.acquire()
+            # qa_list = self.qa_generator.generate_qa_from_raw_data(raw_data['raw_data_id'])
+            
+            # 시뮬레이션용 (실제 사용시 제거)
+            qa_list = self.simulate_qa_generation(raw_data['raw_data_id'])
+            
+            if not qa_list:
+                logger.warning(f"  QA 생성 실패: {product_name}")
+                return {
+                    "product": product_name,
+                    "status": "failed",
+                    "reason": "QA 생성 실패"
+                }
+            
+            logger.info(f"  QA 생성 완료: {product_name}, {len(qa_list)}개")
+            
+            # 성공 기록
+            return {
+                "product": product_name,
+                "status": "success",
+                "raw_data_id": raw_data.get('raw_data_id'),
+                "qa_count": len(qa_list),
+                "data_quality": raw_data.get('data_quality_score', 0)
+            }
+            
+        except Exception as e:
+            logger.error(f"제품 처리 실패: {product_name} - {str(e)}")
+            return {
+                "product": product_name,
+                "status": "error",
+                "reason": str(e)
+            }
+    
+    def find_existing_products(self, products: List[Tuple[str, int]]) -> Set[Tuple[str, int]]:
+        """raw_product_data에 이미 있는 (제품명, 카테고리 ID) 조회"""
+        if not products:
+            return set()
+        
+        product_names = list(dict.fromkeys(product_name for product_name, _ in products))
+        existing = set()
+        
+        # in_ 필터는 URL에 실리므로 제품명을 나눠서 조회 (긴 URL은 게이트웨이에서 거부됨)
+        for start in range(0, len(product_names), EXISTING_LOOKUP_CHUNK_SIZE):
+            chunk = product_names[start:start + EXISTING_LOOKUP_CHUNK_SIZE]
+            try:
+                result = self.supabase.table('raw_product_data').select(
+                    'product_name, category_id'
+                ).in_('product_name', chunk).execute()
+                existing.update((row['product_name'], row['category_id']) for row in result.data or [])
+            except Exception as e:
+                logger.error(f"기존 제품 조회 실패 ({len(chunk)}개 제품은 다시 처리): {e}")
+        
+        return existing
+    
+    def save_raw_data_bulk(self, data_list: List[Dict]) -> List[Optional[int]]:
+        """원본 데이터 일괄 upsert (실패 시 해당 청크만 단건 저장으로 재시도)"""
+        if not data_list:
+            return []
+        
+        insert_rows = [build_raw_row(data) for data in data_list]
+        
+        try:
+            raw_data_ids = upsert_raw_rows(self.supabase, insert_rows)
+            if all(raw_data_ids):
+                return raw_data_ids
+        except Exception as e:
+            logger.warning(f"원본 데이터 일괄 저장 실패, 단건 저장으로 재시도: {e}")
+        
+        raw_data_ids = []
+        for row in insert_rows:
+            try:
+                raw_data_ids.append(upsert_raw_rows(self.supabase, [row])[0])
+            except Exception as e:
+                logger.error(f"원본 데이터 저장 실패: {row['product_name']} - {e}")
+                raw_data_ids.append(None)
+        
+        return raw_data_ids
+    
     def simulate_data_collection(self, product_name: str, category_id: int) -> Dict:
         """데이터 수집 시뮬레이션 (개발/테스트용)"""
         logger.info(f"  시뮬레이션: {product_name} 데이터 수집")
         
-        # 실제 DB에 시뮬레이션 데이터 저장
-        try:
-            combined_text = f"""
+        combined_text = f"""
             제품명: {product_name}
             
             === 쇼핑 정보 ===
@@ -167,43 +286,26 @@ class BatchProcessor:
             뉴스 1: {product_name} 신제품 출시로 시장 주목
             내용: 올해 새롭게 출시된 {product_name} 시리즈가 업계의 주목을 받고 있다...
             """
-            
-            insert_data = {
-                'product_name': product_name,
-                'category_id': category_id,
-                'search_keyword': product_name,
-                'combined_text': combined_text,
-                'shopping_data': [{"title": f"{product_name} 프리미엄", "lprice": 3500000}],
-                'blog_data': [{"title": f"{product_name} 후기", "description": "성능이 뛰어남"}],
-                'news_data': [{"title": f"{product_name} 신제품 출시", "description": "시장 주목"}],
-                'data_quality_score': 0.8,
-                'total_source_count': 15
-            }
-            
-            result = self.supabase.table('raw_product_data').insert(insert_data).execute()
-            
-            if result.data:
-                return {
-                    'product_name': product_name,
-                    'category_id': category_id,
-                    'raw_data_id': result.data[0]['id'],
-                    'total_source_count': 15,
-                    'data_quality_score': 0.8
-                }
-            else:
-                return {}
-                
-        except Exception as e:
-            logger.error(f"시뮬레이션 데이터 저장 실패: {e}")
-            return {}
+        
+        # 저장은 process_product_batch에서 일괄 처리
+        return {
+            'product_name': product_name,
+            'category_id': category_id,
+            'combined_text': combined_text,
+            'shopping_data': [{"title": f"{product_name} 프리미엄", "lprice": 3500000}],
+            'blog_data': [{"title": f"{product_name} 후기", "description": "성능이 뛰어남"}],
+            'news_data': [{"title": f"{product_name} 신제품 출시", "description": "시장 주목"}],
+            'data_quality_score': 0.8,
+            'total_source_count': 15
+        }
     
     def simulate_qa_generation(self, raw_data_id: int) -> List[Dict]:
         """QA 생성 시뮬레이션 (개발/테스트용)"""
         logger.info(f"  시뮬레이션: QA 생성 (raw_data_id: {raw_data_id})")
         
-        # 원본 데이터 조회
+        # 원본 데이터 조회 (combined_text 등 큰 컬럼은 받지 않음)
         try:
-            raw_result = self.supabase.table('raw_product_data').select('*').eq('id', raw_data_id).execute()
+            raw_result = self.supabase.table('raw_product_data').select('product_name').eq('id', raw_data_id).execute()
             if not raw_result.data:
                 return []
             
@@ -221,4 +323,13 @@ class BatchProcessor:
                 {
                     "question": f"성능 좋은 {product_name.split()[0]} 제품 있나요?",
                     "answer": f"{product_name}의 프리미엄 모델을 추천합니다. 최신 기술이 적용되어 성능이 뛰어나며, 여러 사용자 후기에서도 성능 만족도가 높게 나타납니다.",
-                    "question_type": "performance
+                    "question_type": "performance",
+                    "confidence": 0.85
+                }
+            ]
+            
+            return sample_qa
+            
+        except Exception as e:
+            logger.error(f"시뮬레이션 QA 생성 실패: {e}")
+            return []
@@ -3,25 +3,122 @@
 제품별로 쇼핑, 블로그, 뉴스 데이터를 수집하여 하나의 텍스트로 통합
 """
 
-import urllib.request
-import urllib.parse
 import json
+import importlib.util
 import time
 import re
-from typing import Dict, List, Optional
+import html
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import Dict, List, Optional, Tuple
 from datetime import datetime
 import logging
 
+import httpx
+import numpy as np
+from postgrest.exceptions import APIError
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 logger = logging.getLogger(__name__)
 
+# 텍스트 정리용 정규식 (모듈 로드 시 1회 컴파일)
+_HTML_TAG_RE = re.compile(r'<[^<]+?>')
+_WHITESPACE_RE = re.compile(r'\s+')
+
+# 제목/내용을 함께 정리할 때 쓰는 구분자 (공백이 아니고 API 응답에 나오지 않는 제어 문자)
+_FIELD_SEPARATOR = '\x01'
+
+NAVER_API_BASE_URL = "https://openapi.naver.com/v1/search"
+
+# 네이버 API 동시 요청 수 상한 (호출 제한 고려)
+MAX_CONCURRENT_REQUESTS = 8
+
+# 통합 텍스트 최대 길이 (초과분은 절단)
+MAX_COMBINED_TEXT_LENGTH = 8000
+
+# h2 패키지가 있으면 HTTP/2로 요청 다중화 (한 연결에서 쇼핑/블로그/뉴스 동시 요청)
+NAVER_API_HTTP2 = importlib.util.find_spec("h2") is not None
+
+# 네이버 API 초당 호출 한도
+NAVER_API_RATE_PER_SEC = 10
+
+# raw_product_data upsert 충돌 키 (유니크 인덱스 필요: sql/001_raw_product_data_unique_key.sql)
+RAW_DATA_CONFLICT_KEY = 'product_name,category_id'
+
+# on_conflict 대상 유니크 인덱스가 없을 때 PostgreSQL 오류 코드
+MISSING_CONFLICT_CONSTRAINT_CODE = '42P10'
+
+# 유니크 인덱스 존재 여부 (없다고 확인되면 이후 일반 insert만 사용)
+_raw_data_upsert_available = True
+
+class TokenBucket:
+    """스레드 안전 토큰 버킷 (초당 rate개 허용, 최대 capacity개까지 버스트)"""
+    
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def acquire(self):
+        """토큰 1개를 얻을 때까지 대기 (한도 내에서는 대기 없음)"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+                self._updated_at = now
+                
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                
+                wait_seconds = (1 - self._tokens) / self.rate
+            
+            time.sleep(wait_seconds)
+
+# 프로세스 내 모든 수집기가 공유하는 네이버 API 호출 제한
+naver_rate_limiter = TokenBucket(NAVER_API_RATE_PER_SEC, NAVER_API_RATE_PER_SEC)
+
 class NaverDataCollector:
     def __init__(self, client_id: str, client_secret: str, supabase_client):
         self.client_id = client_id
         self.client_secret = client_secret
         self.supabase = supabase_client
         
-    def collect_product_data(self, product_keyword: str, category_id: int) -> Dict:
-        """특정 제품에 대한 멀티소스 데이터 수집"""
+        # 카테고리 검색 키워드 캐시 (category_id → 카테고리 행)
+        self._category_cache: Dict[int, Optional[Dict]] = {}
+        
+        # 키워드별 API 호출을 병렬로 처리하는 공유 스레드 풀
+        self._executor = ThreadPoolExecutor(max_workers=MAX_CONCURRENT_REQUESTS)
+        
+        # 네이버 API 커넥션 풀 (keep-alive 재사용, 인증 헤더는 1회만 설정)
+        self._http = httpx.Client(
+            base_url=NAVER_API_BASE_URL,
+            headers={
+                "X-Naver-Client-Id": client_id,
+                "X-Naver-Client-Secret": client_secret
+            },
+            timeout=30.0,
+            http2=NAVER_API_HTTP2,
+            limits=httpx.Limits(
+                max_connections=MAX_CONCURRENT_REQUESTS,
+                max_keepalive_connections=MAX_CONCURRENT_REQUESTS
+            )
+        )
+    
+    def close(self):
+        """스레드 풀 및 HTTP 커넥션 정리"""
+        self._executor.shutdown(wait=True)
+        self._http.close()
+        
+    def collect_product_data(self, product_keyword: str, category_id: int, save: bool = True) -> Dict:
+        """특정 제품에 대한 멀티소스 데이터 수집 (save=False면 저장은 호출자가 일괄 처리)"""
         logger.info(f"데이터 수집 시작: {product_keyword}")
         
         # 카테고리별 검색 키워드 가져오기
@@ -30,18 +127,26 @@ class NaverDataCollector:
             logger.error(f"카테고리 정보를 찾을 수 없습니다: {category_id}")
             return {}
         
-        # 각 소스별 데이터 수집
-        shopping_data = self.collect_shopping_data(product_keyword, category_info['search_keywords'])
-        blog_data = self.collect_blog_data(product_keyword, category_info['search_keywords'])
-        news_data = self.collect_news_data(product_keyword, category_info['search_keywords'])
+        # 각 소스별 데이터 수집 (쇼핑/블로그/뉴스 동시 진행)
+        search_config = category_info['search_keywords']
+        with ThreadPoolExecutor(max_workers=3) as source_executor:
+            shopping_future = source_executor.submit(self.collect_shopping_data, product_keyword, search_config)
+            blog_future = source_executor.submit(self.collect_blog_data, product_keyword, search_config)
+            news_future = source_executor.submit(self.collect_news_data, product_keyword, search_config)
+            shopping_data = shopping_future.result()
+            blog_data = blog_future.result()
+            news_data = news_future.result()
+        
+        # 가격 정보는 한 번만 배열로 변환해 텍스트 생성과 품질 평가에 공유
+        lprices = lprice_array(shopping_data)
         
         # 통합 텍스트 생성
         combined_text = self.create_combined_text(
-            product_keyword, shopping_data, blog_data, news_data
+            product_keyword, shopping_data, blog_data, news_data, lprices=lprices
         )
         
         # 데이터 품질 평가
-        quality_score = self.calculate_data_quality(shopping_data, blog_data, news_data)
+        quality_score = self.calculate_data_quality(shopping_data, blog_data, news_data, lprices=lprices)
         
         result = {
             'product_name': product_keyword,
@@ -55,41 +160,61 @@ class NaverDataCollector:
         }
         
         # 데이터베이스에 저장
-        saved_id = self.save_raw_data(result)
-        result['raw_data_id'] = saved_id
+        if save:
+            result['raw_data_id'] = self.save_raw_data(result)
         
         logger.info(f"데이터 수집 완료: {product_keyword}, 총 {result['total_source_count']}개 소스")
         return result
     
     def get_category_search_keywords(self, category_id: int) -> Optional[Dict]:
-        """카테고리별 검색 키워드 조회"""
+        """카테고리별 검색 키워드 조회 (조회 결과는 캐시)"""
+        if category_id in self._category_cache:
+            return self._category_cache[category_id]
+        
         try:
             result = self.supabase.table('product_categories').select('*').eq('id', category_id).execute()
-            if result.data:
-                return result.data[0]
-            return None
+            category_info = result.data[0] if result.data else None
+            self._category_cache[category_id] = category_info
+            return category_info
         except Exception as e:
             logger.error(f"카테고리 검색 실패: {e}")
             return None
     
+    def refresh_category_cache(self):
+        """카테고리 캐시 초기화 (카테고리 변경 후 호출)"""
+        self._category_cache.clear()
+    
     def collect_shopping_data(self, keyword: str, search_config: Dict) -> List[Dict]:
         """네이버 쇼핑 데이터 수집"""
         shopping_keywords = search_config.get('shopping', [keyword])
         all_items = []
+        seen_keys = set()
+        
+        results = self.search_naver_api_many(shopping_keywords, 'shop', display=50)
+        
+        # 수집 시각은 호출 단위로 한 번만 계산
+        collected_at = datetime.now().isoformat()
         
-        for search_keyword in shopping_keywords:
-            items = self.search_naver_api(search_keyword, 'shop', display=50)
+        for search_keyword, items in zip(shopping_keywords, results):
             processed_items = []
             
             for item in items:
+                # 연관 키워드 간 중복 결과 제외
+                item_key = item.get('productId') or item.get('link')
+                if item_key:
+                    if item_key in seen_keys:
+                        continue
+                    seen_keys.add(item_key)
+                
                 try:
+                    title, description = self.clean_title_description(item)
                     processed_item = {
-                        'title': self.clean_html_tags(item.get('title', '')),
-                        'description': self.clean_html_tags(item.get('description', '')),
+                        'title': title,
+                        'description': description,
                         'link': item.get('link', ''),
                         'image': item.get('image', ''),
-                        'lprice': int(item.get('lprice', 0)) if item.get('lprice') else 0,
-                        'hprice': int(item.get('hprice', 0)) if item.get('hprice') else 0,
+                        'lprice': parse_price(item.get('lprice')),
+                        'hprice': parse_price(item.get('hprice')),
                         'brand': item.get('brand', ''),
                         'maker': item.get('maker', ''),
                         'category1': item.get('category1', ''),
@@ -97,7 +222,7 @@ class NaverDataCollector:
                         'mallName': item.get('mallName', ''),
                         'productId': item.get('productId', ''),
                         'search_keyword': search_keyword,
-                        'collected_at': datetime.now().isoformat()
+                        'collected_at': collected_at
                     }
                     processed_items.append(processed_item)
                 except Exception as e:
@@ -105,7 +230,6 @@ class NaverDataCollector:
                     continue
             
             all_items.extend(processed_items)
-            time.sleep(0.1)  # API 호출 제한
         
         return all_items
     
@@ -113,22 +237,39 @@ class NaverDataCollector:
         """네이버 블로그 데이터 수집"""
         blog_keywords = search_config.get('blog', [f"{keyword} 후기", f"{keyword} 리뷰"])
         all_items = []
+        seen_keys = set()
         
-        for search_keyword in blog_keywords:
-            items = self.search_naver_api(search_keyword, 'blog', display=50)
+        results = self.search_naver_api_many(blog_keywords, 'blog', display=50)
+        
+        # 수집 시각은 호출 단위로 한 번만 계산
+        collected_at = datetime.now().isoformat()
+        
+        for search_keyword, items in zip(blog_keywords, results):
             processed_items = []
             
             for item in items:
+                # 연관 키워드 간 중복 결과 제외
+                item_key = item.get('link') or item.get('title')
+                if item_key:
+                    if item_key in seen_keys:
+                        continue
+                    seen_keys.add(item_key)
+                
+                # 제목과 내용이 모두 없는 항목은 정리 전에 제외
+                if not item.get('title') and not item.get('description'):
+                    continue
+                
                 try:
+                    title, description = self.clean_title_description(item)
                     processed_item = {
-                        'title': self.clean_html_tags(item.get('title', '')),
-                        'description': self.clean_html_tags(item.get('description', '')),
+                        'title': title,
+                        'description': description,
                         'link': item.get('link', ''),
                         'bloggername': item.get('bloggername', ''),
                         'bloggerlink': item.get('bloggerlink', ''),
                         'postdate': item.get('postdate', ''),
                         'search_keyword': search_keyword,
-                        'collected_at': datetime.now().isoformat()
+                        'collected_at': collected_at
                     }
                     processed_items.append(processed_item)
                 except Exception as e:
@@ -136,7 +277,6 @@ class NaverDataCollector:
                     continue
             
             all_items.extend(processed_items)
-            time.sleep(0.1)
         
         return all_items
     
@@ -144,21 +284,38 @@ class NaverDataCollector:
         """네이버 뉴스 데이터 수집"""
         news_keywords = search_config.get('news', [f"{keyword} 신제품", f"{keyword} 출시"])
         all_items = []
+        seen_keys = set()
         
-        for search_keyword in news_keywords:
-            items = self.search_naver_api(search_keyword, 'news', display=30)
+        results = self.search_naver_api_many(news_keywords, 'news', display=30)
+        
+        # 수집 시각은 호출 단위로 한 번만 계산
+        collected_at = datetime.now().isoformat()
+        
+        for search_keyword, items in zip(news_keywords, results):
             processed_items = []
             
             for item in items:
+                # 연관 키워드 간 중복 결과 제외
+                item_key = item.get('link') or item.get('title')
+                if item_key:
+                    if item_key in seen_keys:
+                        continue
+                    seen_keys.add(item_key)
+                
+                # 제목과 내용이 모두 없는 항목은 정리 전에 제외
+                if not item.get('title') and not item.get('description'):
+                    continue
+                
                 try:
+                    title, description = self.clean_title_description(item)
                     processed_item = {
-                        'title': self.clean_html_tags(item.get('title', '')),
-                        'description': self.clean_html_tags(item.get('description', '')),
+                        'title': title,
+                        'description': description,
                         'link': item.get('link', ''),
                         'originallink': item.get('originallink', ''),
                         'pubDate': item.get('pubDate', ''),
                         'search_keyword': search_keyword,
-                        'collected_at': datetime.now().isoformat()
+                        'collected_at': collected_at
                     }
                     processed_items.append(processed_item)
                 except Exception as e:
@@ -166,101 +323,126 @@ class NaverDataCollector:
                     continue
             
             all_items.extend(processed_items)
-            time.sleep(0.1)
         
         return all_items
     
+    def search_naver_api_many(self, keywords: List[str], endpoint: str, display: int = 100) -> List[List[Dict]]:
+        """여러 키워드에 대한 네이버 API 검색을 병렬로 수행 (입력 순서 유지)"""
+        return list(self._executor.map(
+            lambda keyword: self.search_naver_api(keyword, endpoint, display=display),
+            keywords
+        ))
+    
     def search_naver_api(self, keyword: str, endpoint: str, display: int = 100) -> List[Dict]:
         """네이버 API 검색 (기존 함수 개선)"""
         try:
-            encoded_query = urllib.parse.quote(keyword)
-            url = f"https://openapi.naver.com/v1/search/{endpoint}?query={encoded_query}&display={display}&sort=sim"
+            # API 호출 제한 (토큰 버킷)
+            naver_rate_limiter.acquire()
             
-            request = urllib.request.Request(url)
-            request.add_header("X-Naver-Client-Id", self.client_id)
-            request.add_header("X-Naver-Client-Secret", self.client_secret)
+            response = self._http.get(
+                f"/{endpoint}",
+                params={'query': keyword, 'display': display, 'sort': 'sim'}
+            )
             
-            with urllib.request.urlopen(request, timeout=30) as response:
-                if response.getcode() == 200:
-                    data = json.loads(response.read().decode('utf-8'))
-                    return data.get('items', [])
-                else:
-                    logger.error(f"네이버 API 오류: {response.getcode()}")
-                    return []
-                    
+            if response.status_code == 200:
+                data = loads_json(response.content)
+                return data.get('items', [])
+            else:
+                logger.error(f"네이버 API 오류: {response.status_code}")
+                return []
+                
         except Exception as e:
             logger.error(f"네이버 API 검색 실패 ({endpoint}): {e}")
             return []
     
-    def create_combined_text(self, product_name: str, shopping_data: List, blog_data: List, news_data: List) -> str:
+    def create_combined_text(self, product_name: str, shopping_data: List, blog_data: List, news_data: List,
+                             lprices: Optional[np.ndarray] = None) -> str:
         """모든 수집 데이터를 하나의 텍스트로 통합"""
         sections = []
+        text_length = -1  # join 시 구분자 수 보정
+        
+        def add_section(line: str):
+            nonlocal text_length
+            sections.append(line)
+            text_length += len(line) + 1
+        
+        def is_full() -> bool:
+            # 최대 길이를 넘으면 이후 섹션은 어차피 잘리므로 생성 생략
+            return text_length > MAX_COMBINED_TEXT_LENGTH
         
         # 제품명 섹션
-        sections.append(f"제품명: {product_name}")
+        add_section(f"제품명: {product_name}")
         
         # 쇼핑 정보 섹션
         if shopping_data:
-            sections.append("\n=== 쇼핑 정보 ===")
+            add_section("\n=== 쇼핑 정보 ===")
             
             # 가격 정보 정리
-            prices = [item['lprice'] for item in shopping_data if item.get('lprice', 0) > 0]
-            if prices:
-                min_price = min(prices)
-                max_price = max(prices)
-                avg_price = sum(prices) // len(prices)
-                sections.append(f"가격대: 최저 {min_price:,}원 ~ 최고 {max_price:,}원 (평균 {avg_price:,}원)")
+            if lprices is None:
+                lprices = lprice_array(shopping_data)
+            prices = lprices[lprices > 0]
+            if prices.size:
+                min_price = int(prices.min())
+                max_price = int(prices.max())
+                avg_price = int(prices.sum()) // prices.size
+                add_section(f"가격대: 최저 {min_price:,}원 ~ 최고 {max_price:,}원 (평균 {avg_price:,}원)")
             
             # 브랜드 정보
-            brands = list(set([item.get('brand', '') for item in shopping_data if item.get('brand')]))
+            brands = list(dict.fromkeys(item['brand'] for item in shopping_data if item.get('brand')))
             if brands:
-                sections.append(f"주요 브랜드: {', '.join(brands[:5])}")
+                add_section(f"주요 브랜드: {', '.join(brands[:5])}")
             
-            # 상위 제품 정보
-            for i, item in enumerate(shopping_data[:5], 1):
-                title = item.get('title', '')
-                lprice = item.get('lprice', 0)
-                mall = item.get('mallName', '')
-                if title and lprice:
-                    sections.append(f"{i}. {title} - {lprice:,}원 ({mall})")
+            # 상위 제품 정보 (한 섹션으로 묶어 추가)
+            top_products = "\n".join(
+                f"{i}. {item['title']} - {item['lprice']:,}원 ({item.get('mallName', '')})"
+                for i, item in enumerate(islice(shopping_data, 5), 1)
+                if item.get('title') and item.get('lprice')
+            )
+            if top_products:
+                add_section(top_products)
         
         # 블로그 후기 섹션  
-        if blog_data:
-            sections.append("\n=== 사용자 후기 (블로그) ===")
-            for i, item in enumerate(blog_data[:10], 1):
+        if blog_data and not is_full():
+            add_section("\n=== 사용자 후기 (블로그) ===")
+            for i, item in enumerate(islice(blog_data, 10), 1):
+                if is_full():
+                    break
                 title = item.get('title', '')
                 desc = item.get('description', '')
                 blogger = item.get('bloggername', '')
                 if title and desc:
-                    sections.append(f"후기 {i}: {title}")
-                    sections.append(f"내용: {desc[:200]}...")
+                    add_section(f"후기 {i}: {title}")
+                    add_section(f"내용: {desc[:200]}...")
                     if blogger:
-                        sections.append(f"작성자: {blogger}")
-                    sections.append("")
+                        add_section(f"작성자: {blogger}")
+                    add_section("")
         
         # 뉴스 섹션
-        if news_data:
-            sections.append("\n=== 관련 뉴스 ===")
-            for i, item in enumerate(news_data[:5], 1):
+        if news_data and not is_full():
+            add_section("\n=== 관련 뉴스 ===")
+            for i, item in enumerate(islice(news_data, 5), 1):
+                if is_full():
+                    break
                 title = item.get('title', '')
                 desc = item.get('description', '')
                 pub_date = item.get('pubDate', '')
                 if title and desc:
-                    sections.append(f"뉴스 {i}: {title}")
-                    sections.append(f"내용: {desc[:150]}...")
+                    add_section(f"뉴스 {i}: {title}")
+                    add_section(f"내용: {desc[:150]}...")
                     if pub_date:
-                        sections.append(f"발행일: {pub_date}")
-                    sections.append("")
+                        add_section(f"발행일: {pub_date}")
+                    add_section("")
         
         combined_text = "\n".join(sections)
         
         # 텍스트 정리 (너무 길면 요약)
-        if len(combined_text) > 8000:
-            combined_text = combined_text[:8000] + "... (데이터 크기로 인한 자동 절단)"
+        if len(combined_text) > MAX_COMBINED_TEXT_LENGTH:
+            combined_text = combined_text[:MAX_COMBINED_TEXT_LENGTH] + "... (데이터 크기로 인한 자동 절단)"
         
         return combined_text
     
-    def calculate_data_quality(self, shopping_data: List, blog_data: List, news_data: List) -> float:
+    def calculate_data_quality(self, shopping_data: List, blog_data: List, news_data: List,
+                               lprices: Optional[np.ndarray] = None) -> float:
         """수집된 데이터의 품질 점수 계산 (0-1)"""
         score = 0.0
         
@@ -281,7 +463,9 @@ class NaverDataCollector:
         
         # 쇼핑 데이터 품질 (가격 정보 완성도)
         if shopping_data:
-            price_complete = sum(1 for item in shopping_data if item.get('lprice', 0) > 0)
+            if lprices is None:
+                lprices = lprice_array(shopping_data)
+            price_complete = np.count_nonzero(lprices > 0)
             price_ratio = price_complete / len(shopping_data)
             score += price_ratio * 0.1
         
@@ -289,46 +473,107 @@ class NaverDataCollector:
     
     def save_raw_data(self, data: Dict) -> Optional[int]:
         """원본 데이터 저장"""
+        return self.save_raw_data_bulk([data])[0]
+    
+    def save_raw_data_bulk(self, data_list: List[Dict]) -> List[Optional[int]]:
+        """원본 데이터 일괄 저장 (한 번의 upsert 요청, 입력 순서대로 ID 반환)"""
+        if not data_list:
+            return []
+        
         try:
-            insert_data = {
-                'product_name': data['product_name'],
-                'category_id': data['category_id'],
-                'search_keyword': data['product_name'],
-                'combined_text': data['combined_text'],
-                'shopping_data': data['shopping_data'],
-                'blog_data': data['blog_data'],
-                'news_data': data['news_data'],
-                'data_quality_score': data['data_quality_score'],
-                'total_source_count': data['total_source_count']
-            }
-            
-            result = self.supabase.table('raw_product_data').insert(insert_data).execute()
-            if result.data:
-                return result.data[0]['id']
-            return None
+            return upsert_raw_rows(self.supabase, [build_raw_row(data) for data in data_list])
             
         except Exception as e:
             logger.error(f"원본 데이터 저장 실패: {e}")
-            return None
+            return [None] * len(data_list)
     
     def clean_html_tags(self, text: str) -> str:
         """HTML 태그 제거 및 텍스트 정리"""
         if not text:
             return ""
         
-        # HTML 태그 제거
-        clean_text = re.sub('<[^<]+?>', '', text)
-        
-        # 특수 문자 정리
-        clean_text = clean_text.replace('&quot;', '"')
-        clean_text = clean_text.replace('&amp;', '&')
-        clean_text = clean_text.replace('&lt;', '<')
-        clean_text = clean_text.replace('&gt;', '>')
+        # HTML 태그 제거 후 특수 문자(엔티티) 변환
+        clean_text = html.unescape(_HTML_TAG_RE.sub('', text))
         
         # 연속된 공백 정리
-        clean_text = re.sub(r'\s+', ' ', clean_text)
+        return _WHITESPACE_RE.sub(' ', clean_text).strip()
+    
+    def clean_title_description(self, item: Dict) -> Tuple[str, str]:
+        """제목과 내용을 한 번의 정규식 처리로 함께 정리"""
+        title = item.get('title', '')
+        description = item.get('description', '')
+        
+        cleaned = self.clean_html_tags(f"{title}{_FIELD_SEPARATOR}{description}")
+        parts = cleaned.split(_FIELD_SEPARATOR)
         
-        return clean_text.strip()
+        # 태그 패턴이 구분자를 넘어 매칭된 경우에만 개별 정리
+        if len(parts) != 2:
+            return self.clean_html_tags(title), self.clean_html_tags(description)
+        
+        return parts[0].strip(), parts[1].strip()
+
+def loads_json(payload: bytes):
+    """JSON 응답 바이트 파싱 (orjson 설치 시 디코딩 없이 바로 파싱)"""
+    if orjson is not None:
+        return orjson.loads(payload)
+    return json.loads(payload)
+
+def parse_price(value) -> int:
+    """네이버 쇼핑 가격 문자열을 정수로 변환 (값이 없거나 숫자가 아니면 0)"""
+    if isinstance(value, int):
+        return value
+    return int(value) if value and value.isdigit() else 0
+
+def lprice_array(shopping_data: List[Dict]) -> np.ndarray:
+    """쇼핑 데이터의 최저가(lprice)를 int64 배열로 변환 (가격 없음은 0)"""
+    return np.fromiter(
+        (item.get('lprice') or 0 for item in shopping_data),
+        dtype=np.int64,
+        count=len(shopping_data)
+    )
+
+def build_raw_row(data: Dict) -> Dict:
+    """수집 결과를 raw_product_data 테이블 행으로 변환"""
+    return {
+        'product_name': data['product_name'],
+        'category_id': data['category_id'],
+        'search_keyword': data['product_name'],
+        'combined_text': data['combined_text'],
+        'shopping_data': data['shopping_data'],
+        'blog_data': data['blog_data'],
+        'news_data': data['news_data'],
+        'data_quality_score': data['data_quality_score'],
+        'total_source_count': data['total_source_count']
+    }
+
+def upsert_raw_rows(supabase, rows: List[Dict]) -> List[Optional[int]]:
+    """raw_product_data 일괄 upsert (저장 응답으로 ID만 받아 입력 순서대로 반환, 인덱스가 없으면 일반 insert)"""
+    global _raw_data_upsert_available
+    
+    # 같은 요청 안에서 충돌 키가 중복되면 upsert가 실패하므로 마지막 행만 사용
+    unique_rows = {(row['product_name'], row['category_id']): row for row in rows}
+    
+    # 같은 요청에서 ID/키 컬럼만 돌려받음 (combined_text 등 큰 컬럼은 다시 받지 않음)
+    result = None
+    if _raw_data_upsert_available:
+        try:
+            result = supabase.table('raw_product_data').upsert(
+                list(unique_rows.values()),
+                on_conflict=RAW_DATA_CONFLICT_KEY
+            ).select('id, product_name, category_id').execute()
+        except APIError as e:
+            if e.code != MISSING_CONFLICT_CONSTRAINT_CODE:
+                raise
+            _raw_data_upsert_available = False
+            logger.warning("raw_product_data 유니크 인덱스 없음, 일반 insert로 저장 (sql/001_raw_product_data_unique_key.sql 적용 필요)")
+    
+    if result is None:
+        result = supabase.table('raw_product_data').insert(
+            list(unique_rows.values())
+        ).select('id, product_name, category_id').execute()
+    
+    ids = {(row['product_name'], row['category_id']): row['id'] for row in result.data or []}
+    return [ids.get((row['product_name'], row['category_id'])) for row in rows]
 
 # ========================================
 # 사용 예시
@@ -337,13 +582,10 @@ class NaverDataCollector:
 def collect_product_data_example():
     """데이터 수집 사용 예시"""
     import os
-    from supabase import create_client
+    from supabase_utils import get_supabase_client
     
-    # 클라이언트 초기화
-    supabase = create_client(
-        os.environ.get("SUPABASE_URL"),
-        os.environ.get("SUPABASE_KEY")
-    )
+    # 클라이언트 초기화 (프로세스 공용 커넥션 풀)
+    supabase = get_supabase_client()
     
     collector = NaverDataCollector(
         client_id=os.environ.get("NAVER_CLIENT_ID"),
@@ -0,0 +1,216 @@
+"""
+임베딩 모델 로딩 및 인코딩 유틸리티
+배치 프로세서와 Streamlit 앱이 같은 모델과 임베딩 캐시를 재사용
+"""
+
+import os
+import hashlib
+import threading
+import logging
+from collections import OrderedDict
+from typing import List, Optional
+
+import numpy as np
+from sentence_transformers import SentenceTransformer
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_MODEL_NAME = 'jhgan/ko-sroberta-multitask'
+FALLBACK_MODEL_NAME = 'paraphrase-multilingual-MiniLM-L12-v2'
+
+# 추론 백엔드: 'torch'(기본) 또는 'onnx'(ONNX Runtime + int8 동적 양자화)
+EMBEDDING_BACKEND = os.environ.get("EMBEDDING_BACKEND", "torch")
+ONNX_QUANTIZATION = os.environ.get("EMBEDDING_ONNX_QUANTIZATION", "avx512_vnni")
+ONNX_CACHE_DIR = os.path.expanduser("~/.cache/app-embed")
+
+# PyTorch 백엔드 가중치 정밀도: 'float32'(기본) 또는 'bfloat16'(AVX-512 BF16/AMX CPU에서 빠름)
+EMBEDDING_TORCH_DTYPE = os.environ.get("EMBEDDING_TORCH_DTYPE", "float32")
+
+def _default_num_threads() -> int:
+    """이 프로세스가 쓸 수 있는 CPU 수 (psutil이 있으면 물리 코어 수로 제한해 SMT 과할당 방지)"""
+    try:
+        available = len(os.sched_getaffinity(0))
+    except AttributeError:  # sched_getaffinity 미지원 OS
+        available = os.cpu_count() or 1
+    
+    if psutil is not None:
+        physical = psutil.cpu_count(logical=False)
+        if physical:
+            available = min(available, physical)
+    
+    return available
+
+# PyTorch 백엔드 연산 스레드 수 (기본: 사용 가능한 물리 코어 수, EMBEDDING_NUM_THREADS로 지정 가능)
+TORCH_NUM_THREADS = int(os.environ.get("EMBEDDING_NUM_THREADS", "0")) or _default_num_threads()
+
+# model.encode 배치 크기
+ENCODE_BATCH_SIZE = 1024
+
+# 인코딩 전 텍스트 절단 기준: 모델 최대 토큰 수 × 토큰당 글자 수 상한
+# (토큰 하나가 이보다 긴 경우는 드물어, 절단되는 부분은 모델에서도 잘리는 부분)
+MAX_CHARS_PER_TOKEN = 8
+
+# DB 벡터 컬럼 차원 (모델 출력은 0으로 패딩하거나 절단)
+# 컬럼을 모델 차원(768)으로 바꾸면 패딩 없이 저장/전송:
+#   ALTER TABLE product_qa ALTER COLUMN embedding TYPE vector(768)
+#       USING subvector(embedding, 1, 768)::vector(768);
+# 이후 EMBEDDING_DB_DIM=768로 설정 (벡터 인덱스는 재생성)
+DB_EMBEDDING_DIM = int(os.environ.get("EMBEDDING_DB_DIM", "1536"))
+
+# 텍스트 해시 → 임베딩 캐시 최대 항목 수
+EMBEDDING_CACHE_SIZE = 100_000
+
+_model: Optional[SentenceTransformer] = None
+_model_lock = threading.Lock()
+
+class EmbeddingCache:
+    """텍스트 해시 기반 LRU 임베딩 캐시 (스레드 안전)"""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        with self._lock:
+            embedding = self._data.get(key)
+            if embedding is not None:
+                self._data.move_to_end(key)
+            return embedding
+
+    def put(self, key: str, embedding: np.ndarray):
+        with self._lock:
+            self._data[key] = embedding
+            self._data.move_to_end(key)
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+_embedding_cache = EmbeddingCache(EMBEDDING_CACHE_SIZE)
+
+def _load_quantized_onnx_model(model_name: str) -> SentenceTransformer:
+    """int8 양자화 ONNX 모델 로드 (최초 1회 내보내기 후 로컬 캐시 재사용)"""
+    from sentence_transformers import export_dynamic_quantized_onnx_model
+
+    local_dir = os.path.join(ONNX_CACHE_DIR, model_name.replace('/', '__'))
+    file_name = f"onnx/model_qint8_{ONNX_QUANTIZATION}.onnx"
+
+    if not os.path.exists(os.path.join(local_dir, file_name)):
+        logger.info(f"ONNX 양자화 모델 생성 중: {model_name}")
+        onnx_model = SentenceTransformer(model_name, backend="onnx")
+        onnx_model.save_pretrained(local_dir)
+        export_dynamic_quantized_onnx_model(onnx_model, ONNX_QUANTIZATION, local_dir)
+
+    return SentenceTransformer(local_dir, backend="onnx", model_kwargs={"file_name": file_name})
+
+def _load_model(model_name: str) -> SentenceTransformer:
+    """설정된 백엔드로 모델 로드 (ONNX 실패 시 PyTorch로 대체)"""
+    if EMBEDDING_BACKEND == "onnx":
+        try:
+            return _load_quantized_onnx_model(model_name)
+        except Exception as e:
+            logger.warning(f"ONNX 모델 로드 실패, PyTorch 모델 사용: {e}")
+
+    import torch
+    torch.set_num_threads(TORCH_NUM_THREADS)
+
+    if EMBEDDING_TORCH_DTYPE == "bfloat16":
+        return SentenceTransformer(model_name, model_kwargs={"torch_dtype": torch.bfloat16})
+
+    return SentenceTransformer(model_name)
+
+def load_embedding_model() -> SentenceTransformer:
+    """임베딩 모델 로드 (프로세스당 1회 로드 후 재사용)"""
+    global _model
+
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                try:
+                    _model = _load_model(EMBEDDING_MODEL_NAME)
+                except Exception as e:
+                    logger.warning(f"기본 임베딩 모델 로드 실패, 대체 모델 사용: {e}")
+                    _model = _load_model(FALLBACK_MODEL_NAME)
+                logger.info("임베딩 모델 로드 완료")
+
+    return _model
+
+def text_cache_key(text: str) -> str:
+    """임베딩 캐시 키 (텍스트 내용 해시, xxhash 설치 시 xxh3 사용)"""
+    if xxhash is not None:
+        return xxhash.xxh3_64_hexdigest(text)
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()
+
+def encode_sorted(model: SentenceTransformer, texts: List[str], batch_size: int = ENCODE_BATCH_SIZE) -> np.ndarray:
+    """길이순으로 정렬해 인코딩한 뒤 입력 순서로 복원 (배치 내 패딩 최소화, 최장 길이 제한)"""
+    if model.max_seq_length:
+        max_chars = model.max_seq_length * MAX_CHARS_PER_TOKEN
+        texts = [text[:max_chars] for text in texts]
+    order = np.argsort([len(text) for text in texts], kind='stable')
+    embeddings = model.encode(
+        [texts[i] for i in order],
+        batch_size=batch_size,
+        convert_to_numpy=True,
+        show_progress_bar=False
+    )
+    # 정렬 순서대로 나온 결과를 원래 위치에 바로 배치 (역순열 argsort 생략)
+    # bfloat16 모델 출력도 DB 저장 형식(float32)으로 통일
+    restored = np.empty((len(texts), embeddings.shape[1]), dtype=np.float32)
+    restored[order] = embeddings
+    return restored
+
+def encode_texts(model: SentenceTransformer, texts: List[str]) -> np.ndarray:
+    """텍스트 목록 임베딩 (캐시에 없는 텍스트만 한 번에 인코딩, 입력 순서 유지)"""
+    if not texts:
+        return np.empty((0, model.get_sentence_embedding_dimension()), dtype=np.float32)
+
+    keys = [text_cache_key(text) for text in texts]
+    embeddings = [_embedding_cache.get(key) for key in keys]
+
+    # 캐시 미스 텍스트 (배치 내 중복은 한 번만 인코딩)
+    missing = {}
+    for i, embedding in enumerate(embeddings):
+        if embedding is None:
+            missing.setdefault(keys[i], i)
+
+    if missing:
+        encoded = encode_sorted(model, [texts[i] for i in missing.values()])
+        encoded_by_key = dict(zip(missing, encoded))
+        for key, embedding in encoded_by_key.items():
+            # 행 뷰를 그대로 넣으면 캐시 항목 하나가 배치 행렬 전체를 붙잡으므로 복사본 저장
+            _embedding_cache.put(key, embedding.copy())
+
+        embeddings = [
+            embedding if embedding is not None else encoded_by_key[key]
+            for key, embedding in zip(keys, embeddings)
+        ]
+
+    return np.vstack(embeddings)
+
+def fit_embedding_dim(embeddings: np.ndarray, dim: int = DB_EMBEDDING_DIM) -> np.ndarray:
+    """임베딩 행렬을 DB 벡터 차원에 맞춤 (부족하면 0 패딩, 넘치면 절단)"""
+    if embeddings.shape[1] == dim:
+        return embeddings
+
+    # 0으로 채운 float32 버퍼에 한 번만 복사 (패딩/절단 분기 없음)
+    fitted = np.zeros((embeddings.shape[0], dim), dtype=np.float32)
+    width = min(embeddings.shape[1], dim)
+    fitted[:, :width] = embeddings[:, :width]
+    return fitted
+
+def encode_for_db(model: SentenceTransformer, texts: List[str]) -> np.ndarray:
+    """텍스트 목록을 한 번에 인코딩해 DB 저장/검색용 차원의 행렬로 반환"""
+    return fit_embedding_dim(encode_texts(model, texts))
@@ -10,11 +10,15 @@ import re
 import time
 from typing import List, Dict, Optional
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
+import numpy as np
 import openai
-from supabase import create_client, Client
-from sentence_transformers import SentenceTransformer
+from supabase import Client
+
+from embedding_utils import load_embedding_model as load_shared_embedding_model, encode_for_db
+from supabase_utils import create_pooled_client
 
 # 데이터 수집 및 QA 생성 모듈 import
 # from data_collector import NaverDataCollector
@@ -24,6 +28,10 @@ from sentence_transformers import SentenceTransformer
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# 검색어 정리/단어 분리용 정규식 (모듈 로드 시 1회 컴파일)
+_WHITESPACE_RE = re.compile(r'\s+')
+_WORD_RE = re.compile(r'\w+')
+
 # 페이지 설정
 st.set_page_config(
     page_title="🤖 AI 제품 추천 시스템",
@@ -58,8 +66,8 @@ def init_clients():
             st.error("❌ API 키가 설정되지 않았습니다.")
             st.stop()
         
-        # 클라이언트 초기화
-        supabase = create_client(supabase_url, supabase_key)
+        # 클라이언트 초기화 (keep-alive 커넥션 풀 사용, 세션 간 공유)
+        supabase = create_pooled_client(supabase_url, supabase_key)
         openai.api_key = openai_api_key
         
         return supabase, naver_client_id, naver_client_secret, openai_api_key
@@ -70,17 +78,12 @@ def init_clients():
 
 @st.cache_resource
 def load_embedding_model():
-    """임베딩 모델 로딩"""
+    """임베딩 모델 로딩 (배치 프로세서와 공유하는 로더 사용)"""
     try:
-        model = SentenceTransformer('jhgan/ko-sroberta-multitask')
-        return model
-    except:
-        try:
-            model = SentenceTransformer('paraphrase-multilingual-MiniLM-L12-v2')
-            return model
-        except Exception as e:
-            st.error(f"❌ 임베딩 모델 로드 실패: {str(e)}")
-            return None
+        return load_shared_embedding_model()
+    except Exception as e:
+        st.error(f"❌ 임베딩 모델 로드 실패: {str(e)}")
+        return None
 
 # 전역 변수 초기화
 supabase, naver_client_id, naver_client_secret, openai_api_key = init_clients()
@@ -90,37 +93,32 @@ embedding_model = load_embedding_model()
 # 2. 핵심 검색 함수들
 # ========================================
 
-def generate_query_embedding(query: str) -> Optional[List[float]]:
-    """쿼리 임베딩 생성"""
+def generate_query_embedding(query: str) -> Optional[np.ndarray]:
+    """쿼리 임베딩 생성 (float32 벡터, DB 전송 시점에만 리스트로 변환)"""
     if not embedding_model or not query or len(query.strip()) < 2:
         return None
     
     try:
-        cleaned_query = re.sub(r'\s+', ' ', query.strip())
-        embedding = embedding_model.encode(cleaned_query, convert_to_tensor=False)
-        embedding_list = embedding.tolist() if hasattr(embedding, 'tolist') else list(embedding)
-        
-        # 1536차원으로 패딩
-        if len(embedding_list) == 768:
-            return embedding_list + [0.0] * 768
-        elif len(embedding_list) == 1536:
-            return embedding_list
-        else:
-            if len(embedding_list) < 1536:
-                return embedding_list + [0.0] * (1536 - len(embedding_list))
-            else:
-                return embedding_list[:1536]
-                
+        cleaned_query = _WHITESPACE_RE.sub(' ', query.strip())
+        # 동일 쿼리 재검색 시 캐시된 임베딩 재사용, 1536차원으로 패딩
+        return encode_for_db(embedding_model, [cleaned_query])[0]
+        
     except Exception as e:
         logger.error(f"쿼리 임베딩 생성 실패: {e}")
         return None
 
+@st.cache_data(ttl=600)
+def get_category_id(category_name: str) -> Optional[int]:
+    """카테고리 이름으로 ID 조회 (카테고리 목록은 거의 바뀌지 않으므로 10분 캐시)"""
+    result = supabase.table('product_categories').select('id').eq('category_name', category_name).execute()
+    return result.data[0]['id'] if result.data else None
+
 def semantic_search_qa(query: str, category_filter: str = None, top_k: int = 10) -> List[Dict]:
     """시맨틱 검색으로 관련 QA 찾기"""
     try:
         # 쿼리 임베딩 생성
         query_embedding = generate_query_embedding(query)
-        if not query_embedding:
+        if query_embedding is None:
             return []
         
         # 벡터 검색 쿼리 실행
@@ -132,9 +130,8 @@ def semantic_search_qa(query: str, category_filter: str = None, top_k: int = 10)
         # 카테고리 필터 적용
         if category_filter and category_filter != "전체":
             # 카테고리 ID 조회
-            category_result = supabase.table('product_categories').select('id').eq('category_name', category_filter).execute()
-            if category_result.data:
-                category_id = category_result.data[0]['id']
+            category_id = get_category_id(category_filter)
+            if category_id is not None:
                 base_query = base_query.eq('category_id', category_id)
         
         # 최소 품질 조건
@@ -154,7 +151,7 @@ def semantic_search_qa(query: str, category_filter: str = None, top_k: int = 10)
                 qa['similarity'] = similarity
                 qa_results.append(qa)
         
-        # 유사도 순으로 정렬
+        # 유사도 순으로 정렬 (조회 자체가 top_k개로 제한되어 있어 전체 정렬로 충분)
         qa_results.sort(key=lambda x: x['similarity'], reverse=True)
         return qa_results[:top_k]
         
@@ -166,9 +163,9 @@ def calculate_text_similarity(query: str, question: str, answer: str) -> float:
     """간단한 텍스트 유사도 계산 (임베딩 기반 검색의 대안)"""
     try:
         # 키워드 매칭 기반 유사도
-        query_words = set(re.findall(r'\w+', query.lower()))
-        question_words = set(re.findall(r'\w+', question.lower()))
-        answer_words = set(re.findall(r'\w+', answer.lower()))
+        query_words = set(_WORD_RE.findall(query.lower()))
+        question_words = set(_WORD_RE.findall(question.lower()))
+        answer_words = set(_WORD_RE.findall(answer.lower()))
         
         # 질문과의 유사도 (가중치 0.7)
         question_intersection = query_words.intersection(question_words)
@@ -291,45 +288,52 @@ def generate_ai_recommendation_summary(query: str, qa_list: List[Dict]) -> str:
 # 3. 데이터 관리 함수들
 # ========================================
 
+@st.cache_data(ttl=60)
 def get_database_stats() -> Dict:
-    """데이터베이스 현황 조회"""
-    try:
-        stats = {}
-        
-        # QA 데이터 통계
-        qa_result = supabase.table('product_qa').select('id', count='exact').execute()
-        stats['total_qa'] = qa_result.count if hasattr(qa_result, 'count') else len(qa_result.data)
-        
+    """데이터베이스 현황 조회 (재실행마다 조회하지 않도록 60초 캐시, 조회 오류는 캐시하지 않고 호출부로 전달)"""
+    stats = {}
+    
+    # 서로 독립적인 조회들을 동시에 실행 (왕복 지연 1회 수준)
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        # QA 데이터 통계 (행은 받지 않고 개수만 조회)
+        qa_future = executor.submit(
+            supabase.table('product_qa').select('id', count='exact', head=True).execute
+        )
         # 원본 데이터 통계
-        raw_result = supabase.table('raw_product_data').select('id', count='exact').execute()
-        stats['total_raw_data'] = raw_result.count if hasattr(raw_result, 'count') else len(raw_result.data)
-        
+        raw_future = executor.submit(
+            supabase.table('raw_product_data').select('id', count='exact', head=True).execute
+        )
         # 카테고리별 통계
-        category_stats = supabase.table('product_categories').select('category_name').execute()
-        stats['categories'] = [cat['category_name'] for cat in category_stats.data]
-        
+        category_future = executor.submit(
+            supabase.table('product_categories').select('category_name').execute
+        )
         # 제품별 QA 수 상위 5개
-        product_stats = supabase.table('product_qa_summary').select('*').limit(5).execute()
-        stats['top_products'] = product_stats.data if product_stats.data else []
-        
-        return stats
-        
-    except Exception as e:
-        logger.error(f"DB 통계 조회 실패: {e}")
-        return {}
+        product_future = executor.submit(
+            supabase.table('product_qa_summary').select('*').limit(5).execute
+        )
+    
+    qa_result = qa_future.result()
+    stats['total_qa'] = qa_result.count if hasattr(qa_result, 'count') else len(qa_result.data)
+    
+    raw_result = raw_future.result()
+    stats['total_raw_data'] = raw_result.count if hasattr(raw_result, 'count') else len(raw_result.data)
+    
+    category_stats = category_future.result()
+    stats['categories'] = [cat['category_name'] for cat in category_stats.data]
+    
+    product_stats = product_future.result()
+    stats['top_products'] = product_stats.data if product_stats.data else []
+    
+    return stats
 
+@st.cache_data(ttl=30)
 def get_recent_qa_samples(limit: int = 5) -> List[Dict]:
-    """최근 생성된 QA 샘플 조회"""
-    try:
-        result = supabase.table('product_qa').select(
-            'product_name, question, answer, question_type, confidence_score, created_at'
-        ).order('created_at', desc=True).limit(limit).execute()
-        
-        return result.data if result.data else []
-        
-    except Exception as e:
-        logger.error(f"QA 샘플 조회 실패: {e}")
-        return []
+    """최근 생성된 QA 샘플 조회 (30초 캐시, 조회 오류는 캐시하지 않고 호출부로 전달)"""
+    result = supabase.table('product_qa').select(
+        'product_name, question, answer, question_type, confidence_score, created_at'
+    ).order('created_at', desc=True).limit(limit).execute()
+    
+    return result.data if result.data else []
 
 # ========================================
 # 4. Streamlit UI
@@ -350,7 +354,11 @@ def main():
         st.markdown("### 📊 데이터 현황")
         
         with st.spinner("데이터 로딩 중..."):
-            db_stats = get_database_stats()
+            try:
+                db_stats = get_database_stats()
+            except Exception as e:
+                logger.error(f"DB 통계 조회 실패: {e}")
+                db_stats = {}
         
         if db_stats:
             col1, col2 = st.columns(2)
@@ -369,7 +377,11 @@ def main():
         
         # 최근 QA 샘플
         st.markdown("### 📝 최근 QA 샘플")
-        recent_qa = get_recent_qa_samples(3)
+        try:
+            recent_qa = get_recent_qa_samples(3)
+        except Exception as e:
+            logger.error(f"QA 샘플 조회 실패: {e}")
+            recent_qa = []
         
         for i, qa in enumerate(recent_qa, 1):
             with st.expander(f"샘플 {i}: {qa['product_name']}", expanded=False):
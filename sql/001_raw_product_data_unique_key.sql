@@ -0,0 +1,32 @@
+-- raw_product_data (product_name, category_id) 유니크 인덱스
+-- data_collector.upsert_raw_rows가 이 인덱스를 upsert 충돌 키로 사용
+-- (인덱스가 없으면 일반 insert로 대체되어 같은 제품/카테고리 행이 계속 쌓임)
+--
+-- 주의: 기존 중복 행을 삭제함. 실행 전 백업 권장.
+-- 같은 (product_name, category_id) 중 가장 최근(id 최대) 행만 남기고,
+-- 삭제되는 행을 참조하던 product_qa는 남는 행을 가리키도록 먼저 변경.
+
+BEGIN;
+
+-- 1. 삭제될 원본 행을 참조하는 QA를 남길 행으로 이동
+UPDATE product_qa q
+SET raw_data_id = k.keep_id
+FROM (
+    SELECT id, max(id) OVER (PARTITION BY product_name, category_id) AS keep_id
+    FROM raw_product_data
+) k
+WHERE q.raw_data_id = k.id
+  AND k.id <> k.keep_id;
+
+-- 2. 중복 원본 행 삭제 (최신 행만 유지)
+DELETE FROM raw_product_data a
+USING raw_product_data b
+WHERE a.product_name = b.product_name
+  AND a.category_id = b.category_id
+  AND a.id < b.id;
+
+-- 3. 충돌 키 인덱스 생성
+CREATE UNIQUE INDEX IF NOT EXISTS raw_product_data_product_category_key
+    ON raw_product_data (product_name, category_id);
+
+COMMIT;
@@ -7,12 +7,18 @@ import streamlit as st
 import os
 import json
 import re
-import time
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 import logging
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
-from supabase import create_client, Client
+import numpy as np
+from postgrest.types import ReturnMethod
+from supabase import Client
+
+from supabase_utils import create_pooled_client
+from data_collector import upsert_raw_rows
 
 # 로깅 설정
 logging.basicConfig(level=logging.INFO)
@@ -46,8 +52,8 @@ def init_clients():
             st.error("❌ Supabase API 키가 설정되지 않았습니다.")
             st.stop()
         
-        # 클라이언트 초기화
-        supabase = create_client(supabase_url, supabase_key)
+        # 클라이언트 초기화 (keep-alive 커넥션 풀 사용, 세션 간 공유)
+        supabase = create_pooled_client(supabase_url, supabase_key)
         
         return supabase
         
@@ -58,32 +64,46 @@ def init_clients():
 # 전역 변수 초기화
 supabase = init_clients()
 
+# 카테고리 추정용 키워드 (카테고리 ID → 검색어에 포함되면 해당 카테고리로 판단)
+CATEGORY_KEYWORDS = {
+    1: ('도어락', '현관문', '스마트도어락', '디지털도어락'),
+    2: ('노트북', '랩톱', '컴퓨터', '맥북', 'pc'),
+    3: ('스마트폰', '휴대폰', '아이폰', '갤럭시', '폰'),
+    4: ('태블릿', '아이패드', '갤럭시탭'),
+    5: ('헤드폰', '이어폰', '무선이어폰', '에어팟'),
+    6: ('음식', '식품', '요거트', '우유', '치즈', '과자', '라면', '그릭요거트', '운동화', '신발', '화장품', '향수')
+}
+
 # ========================================
 # 2. 헬퍼 함수들
 # ========================================
 
+@st.cache_resource
+def _ensure_food_category_once() -> bool:
+    """식품 카테고리 확인/추가 (성공 결과만 프로세스 단위로 캐시)"""
+    food_category = supabase.table('product_categories').select('id').eq('category_name', '식품').execute()
+    if not food_category.data:
+        new_category = {
+            'category_name': '식품',
+            'category_keywords': ['음식', '식품', '요거트', '우유', '치즈', '그릭요거트'],
+            'search_keywords': {
+                "shopping": ["식품", "음식"],
+                "blog": ["맛집", "요리", "후기"],
+                "news": ["식품 안전", "건강식품"]
+            }
+        }
+        supabase.table('product_categories').insert(new_category).execute()
+    return True
+
 def ensure_food_category():
-    """식품 카테고리가 없으면 자동 추가"""
+    """식품 카테고리가 없으면 자동 추가 (프로세스당 한 번만 조회)"""
     try:
-        food_category = supabase.table('product_categories').select('id').eq('category_name', '식품').execute()
-        if not food_category.data:
-            new_category = {
-                'category_name': '식품',
-                'category_keywords': ['음식', '식품', '요거트', '우유', '치즈', '그릭요거트'],
-                'search_keywords': {
-                    "shopping": ["식품", "음식"],
-                    "blog": ["맛집", "요리", "후기"],
-                    "news": ["식품 안전", "건강식품"]
-                }
-            }
-            supabase.table('product_categories').insert(new_category).execute()
+        _ensure_food_category_once()
     except Exception as e:
         logger.debug(f"카테고리 추가 실패: {e}")
 
-def generate_product_text(product_name: str, category_id: int) -> str:
-    """제품별 맞춤 텍스트 생성"""
-    if category_id == 6:  # 식품
-        return f"""
+# 제품 설명 텍스트 템플릿 ({product_name} 자리에 제품명 삽입)
+FOOD_PRODUCT_TEXT_TEMPLATE = """
 제품명: {product_name}
 
 === 쇼핑 정보 ===
@@ -103,8 +123,8 @@ def generate_product_text(product_name: str, category_id: int) -> str:
 뉴스 1: {product_name} 건강 효능 주목받아
 내용: 최근 {product_name}의 건강 효능이 알려지면서 소비가 크게 증가하고 있다...
 """
-    else:  # 기타 제품
-        return f"""
+
+DEFAULT_PRODUCT_TEXT_TEMPLATE = """
 제품명: {product_name}
 
 === 쇼핑 정보 ===
@@ -125,70 +145,88 @@ def generate_product_text(product_name: str, category_id: int) -> str:
 내용: {product_name} 시장이 지속적으로 성장하고 있으며 다양한 신제품이 출시되고 있다...
 """
 
-def generate_qa_samples(product_name: str, category_id: int) -> List[Dict]:
-    """제품별 맞춤 QA 샘플 생성"""
+def generate_product_text(product_name: str, category_id: int) -> str:
+    """제품별 맞춤 텍스트 생성"""
     if category_id == 6:  # 식품
-        return [
-            {
-                "question": f"{product_name} 추천해줘",
-                "answer": f"{product_name}은 건강하고 맛있는 식품으로 많은 사람들이 즐기고 있습니다. 다양한 브랜드에서 출시되고 있으며, 대형마트나 온라인에서 쉽게 구매할 수 있습니다. 영양가가 높고 맛도 좋아 아침식사나 간식으로 적합합니다.",
-                "question_type": "recommendation",
-                "confidence_score": 0.8,
-                "key_features": ["영양가높음", "맛좋음", "구매편리"]
-            },
-            {
-                "question": f"맛있는 {product_name} 브랜드 추천",
-                "answer": f"맛있는 {product_name}을 선택하실 때는 원재료, 영양성분, 브랜드 신뢰도를 확인하시는 것이 좋습니다. 사용자 후기를 참고하시고, 개인의 취향에 맞는 제품을 찾아보세요.",
-                "question_type": "features",
-                "confidence_score": 0.75,
-                "key_features": ["브랜드다양", "원재료확인", "개인취향"]
-            },
-            {
-                "question": f"{product_name} 가격 정보",
-                "answer": f"{product_name}의 가격은 브랜드, 용량, 판매처에 따라 다양합니다. 할인 이벤트나 대용량 구매를 활용하면 더 경제적으로 구매하실 수 있습니다.",
-                "question_type": "price",
-                "confidence_score": 0.7,
-                "key_features": ["가격다양", "할인이벤트", "경제적구매"]
-            },
-            {
-                "question": f"{product_name} 영양 성분",
-                "answer": f"{product_name}은 단백질, 칼슘, 비타민 등이 풍부한 영양식품입니다. 건강한 식단을 위해 규칙적으로 섭취하시면 좋습니다.",
-                "question_type": "features",
-                "confidence_score": 0.8,
-                "key_features": ["영양풍부", "건강식품", "규칙섭취"]
-            }
-        ]
+        return FOOD_PRODUCT_TEXT_TEMPLATE.format(product_name=product_name)
     else:  # 기타 제품
-        return [
-            {
-                "question": f"{product_name} 추천해줘",
-                "answer": f"{product_name}은 다양한 브랜드에서 출시되고 있는 인기 제품입니다. 온라인과 오프라인 매장에서 쉽게 구매할 수 있으며, 사용자 후기도 대체로 긍정적입니다. 품질과 가격을 종합적으로 고려할 때 합리적인 선택입니다.",
-                "question_type": "recommendation",
-                "confidence_score": 0.8,
-                "key_features": ["품질우수", "가격합리", "구매편리"]
-            },
-            {
-                "question": f"좋은 {product_name} 고르는 방법",
-                "answer": f"좋은 {product_name}을 선택하실 때는 브랜드 신뢰도, 가격대, 사용자 후기, 제품 사양을 종합적으로 고려하시는 것이 좋습니다. 온라인에서 다양한 옵션을 비교해보세요.",
-                "question_type": "features",
-                "confidence_score": 0.75,
-                "key_features": ["브랜드신뢰", "사양비교", "후기확인"]
-            },
-            {
-                "question": f"{product_name} 가격대",
-                "answer": f"{product_name}의 가격은 브랜드와 제품 사양에 따라 다양합니다. 온라인 쇼핑몰에서 가격을 비교해보시고, 할인 이벤트를 활용하면 더욱 저렴하게 구매하실 수 있습니다.",
-                "question_type": "price",
-                "confidence_score": 0.7,
-                "key_features": ["가격비교", "할인활용", "사양고려"]
-            },
-            {
-                "question": f"{product_name} 사용법",
-                "answer": f"{product_name} 사용 시에는 제품 설명서를 참고하시고, 안전 수칙을 준수하시기 바랍니다. 처음 사용하시는 경우 간단한 기능부터 익혀보세요.",
-                "question_type": "installation",
-                "confidence_score": 0.7,
-                "key_features": ["설명서참고", "안전수칙", "단계적학습"]
-            }
-        ]
+        return DEFAULT_PRODUCT_TEXT_TEMPLATE.format(product_name=product_name)
+
+# 제품 QA 샘플 템플릿 ({product_name} 자리에 제품명 삽입, 식품 외 카테고리는 기본 템플릿 사용)
+FOOD_QA_TEMPLATES = [
+    {
+        "question": "{product_name} 추천해줘",
+        "answer": "{product_name}은 건강하고 맛있는 식품으로 많은 사람들이 즐기고 있습니다. 다양한 브랜드에서 출시되고 있으며, 대형마트나 온라인에서 쉽게 구매할 수 있습니다. 영양가가 높고 맛도 좋아 아침식사나 간식으로 적합합니다.",
+        "question_type": "recommendation",
+        "confidence_score": 0.8,
+        "key_features": ["영양가높음", "맛좋음", "구매편리"]
+    },
+    {
+        "question": "맛있는 {product_name} 브랜드 추천",
+        "answer": "맛있는 {product_name}을 선택하실 때는 원재료, 영양성분, 브랜드 신뢰도를 확인하시는 것이 좋습니다. 사용자 후기를 참고하시고, 개인의 취향에 맞는 제품을 찾아보세요.",
+        "question_type": "features",
+        "confidence_score": 0.75,
+        "key_features": ["브랜드다양", "원재료확인", "개인취향"]
+    },
+    {
+        "question": "{product_name} 가격 정보",
+        "answer": "{product_name}의 가격은 브랜드, 용량, 판매처에 따라 다양합니다. 할인 이벤트나 대용량 구매를 활용하면 더 경제적으로 구매하실 수 있습니다.",
+        "question_type": "price",
+        "confidence_score": 0.7,
+        "key_features": ["가격다양", "할인이벤트", "경제적구매"]
+    },
+    {
+        "question": "{product_name} 영양 성분",
+        "answer": "{product_name}은 단백질, 칼슘, 비타민 등이 풍부한 영양식품입니다. 건강한 식단을 위해 규칙적으로 섭취하시면 좋습니다.",
+        "question_type": "features",
+        "confidence_score": 0.8,
+        "key_features": ["영양풍부", "건강식품", "규칙섭취"]
+    }
+]
+
+DEFAULT_QA_TEMPLATES = [
+    {
+        "question": "{product_name} 추천해줘",
+        "answer": "{product_name}은 다양한 브랜드에서 출시되고 있는 인기 제품입니다. 온라인과 오프라인 매장에서 쉽게 구매할 수 있으며, 사용자 후기도 대체로 긍정적입니다. 품질과 가격을 종합적으로 고려할 때 합리적인 선택입니다.",
+        "question_type": "recommendation",
+        "confidence_score": 0.8,
+        "key_features": ["품질우수", "가격합리", "구매편리"]
+    },
+    {
+        "question": "좋은 {product_name} 고르는 방법",
+        "answer": "좋은 {product_name}을 선택하실 때는 브랜드 신뢰도, 가격대, 사용자 후기, 제품 사양을 종합적으로 고려하시는 것이 좋습니다. 온라인에서 다양한 옵션을 비교해보세요.",
+        "question_type": "features",
+        "confidence_score": 0.75,
+        "key_features": ["브랜드신뢰", "사양비교", "후기확인"]
+    },
+    {
+        "question": "{product_name} 가격대",
+        "answer": "{product_name}의 가격은 브랜드와 제품 사양에 따라 다양합니다. 온라인 쇼핑몰에서 가격을 비교해보시고, 할인 이벤트를 활용하면 더욱 저렴하게 구매하실 수 있습니다.",
+        "question_type": "price",
+        "confidence_score": 0.7,
+        "key_features": ["가격비교", "할인활용", "사양고려"]
+    },
+    {
+        "question": "{product_name} 사용법",
+        "answer": "{product_name} 사용 시에는 제품 설명서를 참고하시고, 안전 수칙을 준수하시기 바랍니다. 처음 사용하시는 경우 간단한 기능부터 익혀보세요.",
+        "question_type": "installation",
+        "confidence_score": 0.7,
+        "key_features": ["설명서참고", "안전수칙", "단계적학습"]
+    }
+]
+
+def generate_qa_samples(product_name: str, category_id: int) -> List[Dict]:
+    """제품별 맞춤 QA 샘플 생성"""
+    templates = FOOD_QA_TEMPLATES if category_id == 6 else DEFAULT_QA_TEMPLATES
+    return [
+        {
+            **template,
+            "question": template["question"].format(product_name=product_name),
+            "answer": template["answer"].format(product_name=product_name),
+            "key_features": list(template["key_features"])
+        }
+        for template in templates
+    ]
 
 def extract_brand_name(product_name: str) -> str:
     """제품명에서 브랜드 추출"""
@@ -201,8 +239,8 @@ def extract_brand_name(product_name: str) -> str:
 # 3. 실시간 데이터 수집 함수들
 # ========================================
 
-def auto_collect_and_generate_qa_fixed(query: str) -> bool:
-    """수정된 자동 데이터 수집 및 QA 생성 함수"""
+def auto_collect_and_generate_qa_fixed(query: str) -> Tuple[bool, List[Dict]]:
+    """수정된 자동 데이터 수집 및 QA 생성 함수 (성공 여부와 저장된 QA 행 반환)"""
     try:
         # 진행 상황 표시
         progress_container = st.container()
@@ -215,22 +253,13 @@ def auto_collect_and_generate_qa_fixed(query: str) -> bool:
             progress_bar.progress(10)
             
             # 1. 카테고리 추정
-            category_keywords = {
-                1: ['도어락', '현관문', '스마트도어락', '디지털도어락'],
-                2: ['노트북', '랩톱', '컴퓨터', '맥북', 'pc'],
-                3: ['스마트폰', '휴대폰', '아이폰', '갤럭시', '폰'],
-                4: ['태블릿', '아이패드', '갤럭시탭'],
-                5: ['헤드폰', '이어폰', '무선이어폰', '에어팟'],
-                6: ['음식', '식품', '요거트', '우유', '치즈', '과자', '라면', '그릭요거트', '운동화', '신발', '화장품', '향수']
-            }
-            
             # 식품 카테고리 자동 추가
             ensure_food_category()
             
             estimated_category_id = 2  # 기본값
             query_lower = query.lower()
             
-            for cat_id, keywords in category_keywords.items():
+            for cat_id, keywords in CATEGORY_KEYWORDS.items():
                 if any(keyword in query_lower for keyword in keywords):
                     estimated_category_id = cat_id
                     break
@@ -258,13 +287,12 @@ def auto_collect_and_generate_qa_fixed(query: str) -> bool:
                 'total_source_count': 12
             }
             
-            raw_result = supabase.table('raw_product_data').insert(raw_data).execute()
+            # 같은 제품/카테고리를 다시 수집해도 충돌 없이 갱신 (응답은 ID만 받음)
+            raw_data_id = upsert_raw_rows(supabase, [raw_data])[0]
             
-            if not raw_result.data:
+            if raw_data_id is None:
                 st.error("❌ 원본 데이터 저장 실패")
-                return False
-            
-            raw_data_id = raw_result.data[0]['id']
+                return False, []
             
             progress_bar.progress(70)
             status_text.text("🤖 4단계: 질문-답변 데이터 생성 중...")
@@ -275,13 +303,14 @@ def auto_collect_and_generate_qa_fixed(query: str) -> bool:
             progress_bar.progress(90)
             status_text.text("✅ 5단계: 최종 저장 중...")
             
-            # 5. QA 데이터베이스에 저장
-            saved_count = 0
-            for qa in qa_samples:
-                qa_data = {
+            # 5. QA 데이터베이스에 저장 (한 번의 요청으로 일괄 저장)
+            brand = extract_brand_name(product_name)
+            generated_at = datetime.now().isoformat()
+            qa_rows = [
+                {
                     'raw_data_id': raw_data_id,
                     'product_name': product_name,
-                    'brand': extract_brand_name(product_name),
+                    'brand': brand,
                     'category_id': estimated_category_id,
                     'question': qa['question'],
                     'answer': qa['answer'],
@@ -290,108 +319,142 @@ def auto_collect_and_generate_qa_fixed(query: str) -> bool:
                     'recommendation_data': {
                         'key_features': qa.get('key_features', ['품질우수', '가격합리적', '다양한선택']),
                         'auto_generated': True,
-                        'generated_at': datetime.now().isoformat()
+                        'generated_at': generated_at
                     }
                 }
-                
-                try:
-                    result = supabase.table('product_qa').insert(qa_data).execute()
-                    if result.data:
-                        saved_count += 1
-                except Exception as e:
-                    st.warning(f"QA 저장 중 오류: {e}")
-                    continue
+                for qa in qa_samples
+            ]
+            
+            # 응답 본문 없이 저장 (재검색 대신 보낸 행을 그대로 결과로 사용, 화면에서 id는 쓰지 않음)
+            saved_rows = []
+            try:
+                supabase.table('product_qa').insert(qa_rows, returning=ReturnMethod.minimal).execute()
+                saved_rows = qa_rows
+            except Exception as e:
+                st.warning(f"QA 저장 중 오류: {e}")
             
             progress_bar.progress(100)
             status_text.text("🎉 완료!")
             
             # 진행 표시 제거
-            time.sleep(1)
             progress_bar.empty()
             status_text.empty()
             
-            if saved_count > 0:
-                st.success(f"✅ {product_name}에 대한 {saved_count}개의 QA가 생성되었습니다!")
-                return True
+            if saved_rows:
+                # 새 데이터가 반영되도록 검색/통계 캐시 무효화
+                text_based_search_qa.clear()
+                get_database_stats.clear()
+                get_recent_qa_samples.clear()
+                fetch_available_products.clear()
+                st.success(f"✅ {product_name}에 대한 {len(saved_rows)}개의 QA가 생성되었습니다!")
+                return True, saved_rows
             else:
                 st.error("❌ QA 데이터 저장에 실패했습니다.")
-                return False
+                return False, []
                 
     except Exception as e:
         st.error(f"❌ 자동 데이터 수집 실패: {str(e)}")
         logger.error(f"자동 QA 생성 실패: {e}")
-        return False
+        return False, []
 
 # ========================================
 # 4. 핵심 검색 함수들
 # ========================================
 
+@st.cache_data(ttl=600)
+def get_category_id(category_name: str) -> Optional[int]:
+    """카테고리 이름으로 ID 조회 (카테고리 목록은 거의 바뀌지 않으므로 10분 캐시)"""
+    result = supabase.table('product_categories').select('id').eq('category_name', category_name).execute()
+    return result.data[0]['id'] if result.data else None
+
+# 키워드 검색 대상 컬럼
+KEYWORD_SEARCH_COLUMNS = ('question', 'answer', 'product_name')
+
+def build_keyword_filter(keywords: List[str]) -> str:
+    """키워드 목록을 PostgREST or 필터 문자열로 변환 (질문/답변/제품명 부분 일치)"""
+    clauses = []
+    for keyword in keywords:
+        # 쉼표, 괄호 등 필터 구분 문자가 들어가도 깨지지 않도록 값을 큰따옴표로 감쌈
+        quoted = keyword.replace('\\', '\\\\').replace('"', '\\"')
+        clauses.extend(f'{column}.ilike."%{quoted}%"' for column in KEYWORD_SEARCH_COLUMNS)
+    return ",".join(clauses)
+
+def extract_search_keywords(query: str) -> List[str]:
+    """검색어에서 핵심 키워드 추출 (두 글자 이상)"""
+    return [word.strip() for word in query.split() if len(word.strip()) > 1]
+
+def rank_qa_results(final_results: List[Dict], keywords: List[str], top_k: int) -> List[Dict]:
+    """키워드 매칭 수와 신뢰도로 QA 정렬 후 상위 top_k개 반환 (relevance_score 기록)"""
+    # 간단한 점수 계산 (키워드 매칭 수, 키워드와 행 텍스트의 소문자 변환은 한 번만)
+    keywords_lower = [keyword.lower() for keyword in keywords]
+    texts_lower = [f"{qa['question']} {qa['answer']} {qa['product_name']}".lower() for qa in final_results]
+    relevance_scores = np.array(
+        [sum(keyword in text for keyword in keywords_lower) for text in texts_lower],
+        dtype=np.int32
+    )
+    confidence_scores = np.array([qa['confidence_score'] for qa in final_results], dtype=np.float64)
+    
+    # 점수순 정렬 (관련도 → 신뢰도 내림차순, 동점은 조회 순서 유지)
+    top_indices = np.lexsort((-confidence_scores, -relevance_scores))[:top_k]
+    
+    top_results = []
+    for i in top_indices:
+        qa = final_results[i]
+        qa['relevance_score'] = int(relevance_scores[i])
+        top_results.append(qa)
+    
+    return top_results
+
+@st.cache_data(ttl=300)
 def text_based_search_qa(query: str, category_filter: str = None, top_k: int = 10) -> List[Dict]:
-    """텍스트 기반 검색으로 관련 QA 찾기 (기본 검색)"""
-    try:
-        # 검색어에서 핵심 키워드 추출
-        keywords = [word.strip() for word in query.split() if len(word.strip()) > 1]
-        
-        # 기본 쿼리
-        base_query = supabase.table('product_qa').select('*')
-        
-        # 카테고리 필터 적용
-        if category_filter and category_filter != "전체":
-            category_result = supabase.table('product_categories').select('id').eq('category_name', category_filter).execute()
-            if category_result.data:
-                category_id = category_result.data[0]['id']
-                base_query = base_query.eq('category_id', category_id)
-        
-        # 키워드별 검색 결과 수집
-        all_results = []
-        
-        for keyword in keywords:
-            if len(keyword) > 1:
-                try:
-                    # 각 키워드에 대해 OR 검색
-                    result = base_query.or_(
-                        f"question.ilike.%{keyword}%,answer.ilike.%{keyword}%,product_name.ilike.%{keyword}%"
-                    ).gte('confidence_score', 0.5).execute()
-                    
-                    all_results.extend(result.data)
-                    
-                except Exception as e:
-                    continue
-        
-        # 중복 제거 (ID 기준)
-        unique_results = {}
-        for result in all_results:
-            qa_id = result['id']
-            if qa_id not in unique_results:
-                unique_results[qa_id] = result
-        
-        final_results = list(unique_results.values())
-        
-        # 간단한 점수 계산 (키워드 매칭 수)
-        for qa in final_results:
-            score = 0
-            qa_text = f"{qa['question']} {qa['answer']} {qa['product_name']}".lower()
-            
-            for keyword in keywords:
-                if keyword.lower() in qa_text:
-                    score += 1
-            
-            qa['relevance_score'] = score
-        
-        # 점수순으로 정렬
-        final_results.sort(key=lambda x: (x['relevance_score'], x['confidence_score']), reverse=True)
-        
-        return final_results[:top_k]
-        
-    except Exception as e:
-        logger.error(f"텍스트 검색 실패: {e}")
+    """텍스트 기반 검색으로 관련 QA 찾기 (같은 검색은 5분간 캐시, 조회 오류는 캐시하지 않고 호출부로 전달)"""
+    # 검색어에서 핵심 키워드 추출
+    keywords = extract_search_keywords(query)
+    if not keywords:
+        return []
+    
+    # 기본 쿼리 (화면/추천에 쓰는 컬럼만 조회, 임베딩 등 큰 컬럼 제외)
+    base_query = supabase.table('product_qa').select(
+        'id, product_name, brand, question, answer, question_type, recommendation_data, confidence_score'
+    )
+    
+    # 카테고리 필터 적용
+    if category_filter and category_filter != "전체":
+        category_id = get_category_id(category_filter)
+        if category_id is not None:
+            base_query = base_query.eq('category_id', category_id)
+    
+    # 모든 키워드를 하나의 OR 조건으로 묶어 한 번에 조회 (중복 행 없음)
+    result = base_query.or_(build_keyword_filter(keywords)).gte('confidence_score', 0.5).execute()
+    
+    return rank_qa_results(result.data or [], keywords, top_k)
+
+def search_new_qa_rows(query: str, qa_rows: List[Dict], category_filter: str = None, top_k: int = 10) -> List[Dict]:
+    """방금 저장한 QA 행에 텍스트 검색과 같은 조건 적용 (DB 재조회 없이 로컬에서 점수 계산)"""
+    keywords = extract_search_keywords(query)
+    if not keywords:
         return []
+    
+    if category_filter and category_filter != "전체":
+        category_id = get_category_id(category_filter)
+        if category_id is not None:
+            qa_rows = [qa for qa in qa_rows if qa.get('category_id') == category_id]
+    
+    qa_rows = [qa for qa in qa_rows if qa['confidence_score'] >= 0.5]
+    
+    # 키워드가 하나도 맞지 않는 행은 DB 검색에서도 조회되지 않으므로 제외
+    return [qa for qa in rank_qa_results(qa_rows, keywords, top_k) if qa['relevance_score'] > 0]
 
 def enhanced_text_based_search_qa(query: str, category_filter: str = None, top_k: int = 10) -> List[Dict]:
     """개선된 텍스트 기반 검색 (자동 데이터 수집 포함) - 수정 버전"""
     try:
-        # 1. 기존 검색 시도
-        results = text_based_search_qa(query, category_filter, top_k)
+        # 1. 기존 검색 시도 (조회 오류는 결과 없음과 구분해 자동 수집을 권하지 않음)
+        try:
+            results = text_based_search_qa(query, category_filter, top_k)
+        except Exception as e:
+            logger.error(f"텍스트 검색 실패: {e}")
+            st.error("검색 중 오류가 발생했습니다. 잠시 후 다시 시도해주세요.")
+            return []
         
         # 2. 결과가 없으면 자동 데이터 수집 옵션 제공
         if not results:
@@ -426,22 +489,21 @@ def enhanced_text_based_search_qa(query: str, category_filter: str = None, top_k
                     st.session_state.auto_collection_triggered = True
             
             with col2:
-                if st.button("🔄 페이지 새로고침", key=f"refresh_{hash(query)}"):
-                    st.rerun()
+                # 버튼 클릭 자체가 스크립트를 다시 실행하므로 추가 st.rerun() 불필요
+                st.button("🔄 페이지 새로고침", key=f"refresh_{hash(query)}")
             
             # 자동 수집 실행
             if st.session_state.auto_collection_triggered:
                 st.markdown("---")
                 
-                success = auto_collect_and_generate_qa_fixed(query)
+                success, new_rows = auto_collect_and_generate_qa_fixed(query)
                 
                 if success:
                     # 재검색 실행
                     st.info("🔄 새로 생성된 정보로 다시 검색합니다...")
-                    time.sleep(1)
                     
-                    # 새로 생성된 데이터로 검색
-                    new_results = text_based_search_qa(query, category_filter, top_k)
+                    # 새로 생성된 데이터로 검색 (저장 결과를 그대로 사용해 DB 재조회 생략)
+                    new_results = search_new_qa_rows(query, new_rows, category_filter, top_k)
                     
                     if new_results:
                         st.success(f"🎉 {len(new_results)}개의 새로운 정보를 찾았습니다!")
@@ -472,47 +534,38 @@ def create_direct_recommendation(query: str, qa_list: List[Dict]) -> Dict:
         if not qa_list:
             return {"error": "관련 정보를 찾을 수 없습니다."}
         
-        # 제품별 정보 정리
+        # 제품별로 QA 묶기 (검색 결과 순서 유지)
+        groups = defaultdict(list)
+        for qa in qa_list:
+            groups[qa['product_name']].append(qa)
+        
+        # 제품별 정보 정리 (그룹당 한 번에 집계)
         products_info = {}
         
-        for qa in qa_list:
-            product_name = qa['product_name']
-            if product_name not in products_info:
-                products_info[product_name] = {
-                    'brand': qa.get('brand', ''),
-                    'answers': [],
-                    'question_types': set(),
-                    'total_confidence': 0,
-                    'count': 0,
-                    'best_qa': qa,
-                    'auto_generated': False
-                }
-            
-            products_info[product_name]['answers'].append({
-                'question': qa['question'],
-                'answer': qa['answer'],
-                'type': qa['question_type'],
-                'confidence': qa.get('confidence_score', 0),
-                'relevance': qa.get('relevance_score', 0)
-            })
-            
-            products_info[product_name]['question_types'].add(qa['question_type'])
-            products_info[product_name]['total_confidence'] += qa.get('confidence_score', 0)
-            products_info[product_name]['count'] += 1
+        for product_name, group in groups.items():
+            total_confidence = sum(qa.get('confidence_score', 0) for qa in group)
             
-            # 자동 생성 여부 확인
-            if qa.get('recommendation_data', {}).get('auto_generated'):
-                products_info[product_name]['auto_generated'] = True
-            
-            # 더 관련성 높은 QA로 업데이트
-            if qa.get('relevance_score', 0) > products_info[product_name]['best_qa'].get('relevance_score', 0):
-                products_info[product_name]['best_qa'] = qa
-        
-        # 평균 신뢰도 계산
-        for product in products_info:
-            info = products_info[product]
-            info['avg_confidence'] = info['total_confidence'] / max(info['count'], 1)
-            info['question_types'] = list(info['question_types'])
+            products_info[product_name] = {
+                'brand': group[0].get('brand', ''),
+                'answers': [
+                    {
+                        'question': qa['question'],
+                        'answer': qa['answer'],
+                        'type': qa['question_type'],
+                        'confidence': qa.get('confidence_score', 0),
+                        'relevance': qa.get('relevance_score', 0)
+                    }
+                    for qa in group
+                ],
+                'question_types': list({qa['question_type']: None for qa in group}),
+                'total_confidence': total_confidence,
+                'count': len(group),
+                'avg_confidence': total_confidence / len(group),
+                # 가장 관련성 높은 QA (동점이면 먼저 나온 QA)
+                'best_qa': max(group, key=lambda qa: qa.get('relevance_score', 0)),
+                # 자동 생성 여부 확인
+                'auto_generated': any((qa.get('recommendation_data') or {}).get('auto_generated') for qa in group)
+            }
         
         # 제품을 관련성과 신뢰도로 정렬
         sorted_products = sorted(
@@ -539,53 +592,125 @@ def create_direct_recommendation(query: str, qa_list: List[Dict]) -> Dict:
 # 5. 데이터 관리 함수들
 # ========================================
 
-def get_database_stats() -> Dict:
-    """데이터베이스 현황 조회"""
+# PostgREST가 함수를 찾지 못했을 때의 오류 코드
+RPC_NOT_FOUND_CODE = 'PGRST202'
+
+@st.cache_resource
+def missing_rpc_functions() -> set:
+    """DB에 없는 것으로 확인된 RPC 함수 이름 (프로세스 전체 공유)"""
+    return set()
+
+def call_optional_rpc(function_name: str, params: Optional[Dict] = None):
+    """배포되지 않았을 수 있는 RPC 호출 (없거나 실패하면 None, 없는 함수는 다시 호출하지 않음)"""
+    missing = missing_rpc_functions()
+    if function_name in missing:
+        return None
+    
     try:
-        stats = {}
-        
-        # QA 데이터 통계
-        qa_result = supabase.table('product_qa').select('id', count='exact').execute()
-        stats['total_qa'] = qa_result.count if hasattr(qa_result, 'count') else len(qa_result.data)
-        
+        return supabase.rpc(function_name, params or {}).execute()
+    except Exception as e:
+        if getattr(e, 'code', None) == RPC_NOT_FOUND_CODE:
+            missing.add(function_name)
+            logger.info(f"{function_name} RPC 없음, 이후 테이블 조회만 사용")
+        else:
+            logger.debug(f"{function_name} RPC 호출 실패, 테이블 조회로 대체: {e}")
+        return None
+
+@st.cache_data(ttl=60)
+def get_database_stats() -> Dict:
+    """데이터베이스 현황 조회 (재실행마다 조회하지 않도록 60초 캐시, 조회 오류는 캐시하지 않고 호출부로 전달)"""
+    # 통계 함수 (DB에 생성되어 있으면 왕복 1회로 모든 통계 조회):
+    #   CREATE FUNCTION dashboard_stats()
+    #   RETURNS TABLE(total_qa bigint, total_raw bigint, categories text[]) LANGUAGE sql STABLE AS $$
+    #       SELECT (SELECT count(*) FROM product_qa),
+    #              (SELECT count(*) FROM raw_product_data),
+    #              (SELECT array_agg(category_name) FROM product_categories)
+    #   $$;
+    result = call_optional_rpc('dashboard_stats')
+    if result is not None and result.data:
+        row = result.data[0]
+        return {
+            'total_qa': row['total_qa'],
+            'total_raw_data': row['total_raw'],
+            'categories': row['categories'] or []
+        }
+    
+    stats = {}
+    
+    # 서로 독립적인 조회들을 동시에 실행 (왕복 지연 1회 수준)
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        # QA 데이터 통계 (행은 받지 않고 개수만 조회)
+        qa_future = executor.submit(
+            supabase.table('product_qa').select('id', count='exact', head=True).execute
+        )
         # 원본 데이터 통계
-        raw_result = supabase.table('raw_product_data').select('id', count='exact').execute()
-        stats['total_raw_data'] = raw_result.count if hasattr(raw_result, 'count') else len(raw_result.data)
-        
+        raw_future = executor.submit(
+            supabase.table('raw_product_data').select('id', count='exact', head=True).execute
+        )
         # 카테고리별 통계
-        category_stats = supabase.table('product_categories').select('category_name').execute()
-        stats['categories'] = [cat['category_name'] for cat in category_stats.data]
-        
-        return stats
-        
-    except Exception as e:
-        logger.error(f"DB 통계 조회 실패: {e}")
-        return {}
+        category_future = executor.submit(
+            supabase.table('product_categories').select('category_name').execute
+        )
+    
+    qa_result = qa_future.result()
+    stats['total_qa'] = qa_result.count if hasattr(qa_result, 'count') else len(qa_result.data)
+    
+    raw_result = raw_future.result()
+    stats['total_raw_data'] = raw_result.count if hasattr(raw_result, 'count') else len(raw_result.data)
+    
+    category_stats = category_future.result()
+    stats['categories'] = [cat['category_name'] for cat in category_stats.data]
+    
+    return stats
 
+@st.cache_data(ttl=30)
 def get_recent_qa_samples(limit: int = 5) -> List[Dict]:
-    """최근 생성된 QA 샘플 조회"""
-    try:
-        result = supabase.table('product_qa').select(
-            'product_name, question, answer, question_type, confidence_score, created_at, recommendation_data'
-        ).order('created_at', desc=True).limit(limit).execute()
-        
-        return result.data if result.data else []
-        
-    except Exception as e:
-        logger.error(f"QA 샘플 조회 실패: {e}")
-        return []
+    """최근 생성된 QA 샘플 조회 (30초 캐시, 조회 오류는 캐시하지 않고 호출부로 전달)"""
+    result = supabase.table('product_qa').select(
+        'product_name, question, answer, question_type, confidence_score, created_at, recommendation_data'
+    ).order('created_at', desc=True).limit(limit).execute()
+    
+    return result.data if result.data else []
+
+# 제품 목록 표시 개수 상한
+AVAILABLE_PRODUCTS_LIMIT = 50
+
+# RPC가 없을 때 제품 목록 집계에 사용할 최대 QA 행 수
+AVAILABLE_PRODUCTS_SCAN_LIMIT = 1000
+
+@st.cache_data(ttl=120)
+def fetch_available_products() -> Dict[str, set]:
+    """검색 가능한 제품별 질문 유형 조회 (DB에서 제품 단위로 집계, 2분 캐시)"""
+    # 집계 함수 (DB에 생성되어 있으면 제품 수만큼의 행만 전송):
+    #   CREATE FUNCTION available_products(lim int DEFAULT 50)
+    #   RETURNS TABLE(product_name text, question_types text[]) LANGUAGE sql STABLE AS $$
+    #       SELECT product_name, array_agg(DISTINCT question_type)
+    #       FROM product_qa GROUP BY product_name ORDER BY product_name LIMIT lim
+    #   $$;
+    result = call_optional_rpc('available_products', {'lim': AVAILABLE_PRODUCTS_LIMIT})
+    if result is not None:
+        return {row['product_name']: set(row['question_types'] or []) for row in result.data or []}
+    
+    # RPC와 같은 제품명 순서로 조회
+    result = supabase.table('product_qa').select(
+        'product_name, question_type'
+    ).order('product_name').limit(AVAILABLE_PRODUCTS_SCAN_LIMIT).execute()
+    products = {}
+    
+    for qa in result.data:
+        product_name = qa['product_name']
+        if product_name not in products:
+            if len(products) >= AVAILABLE_PRODUCTS_LIMIT:
+                continue
+            products[product_name] = set()
+        products[product_name].add(qa['question_type'])
+    
+    return products
 
 def show_available_products():
     """현재 검색 가능한 제품 목록 표시"""
     try:
-        result = supabase.table('product_qa').select('product_name, question_type').execute()
-        products = {}
-        
-        for qa in result.data:
-            product_name = qa['product_name']
-            if product_name not in products:
-                products[product_name] = set()
-            products[product_name].add(qa['question_type'])
+        products = fetch_available_products()
         
         if products:
             st.info("💡 현재 검색 가능한 제품들:")
@@ -620,7 +745,11 @@ def main():
         st.markdown("### 📊 데이터 현황")
         
         with st.spinner("데이터 로딩 중..."):
-            db_stats = get_database_stats()
+            try:
+                db_stats = get_database_stats()
+            except Exception as e:
+                logger.error(f"DB 통계 조회 실패: {e}")
+                db_stats = {}
         
         if db_stats:
             col1, col2 = st.columns(2)
@@ -639,7 +768,11 @@ def main():
         
         # 최근 QA 샘플
         st.markdown("### 📝 최근 QA 샘플")
-        recent_qa = get_recent_qa_samples(3)
+        try:
+            recent_qa = get_recent_qa_samples(3)
+        except Exception as e:
+            logger.error(f"QA 샘플 조회 실패: {e}")
+            recent_qa = []
         
         for i, qa in enumerate(recent_qa, 1):
             with st.expander(f"샘플 {i}: {qa['product_name']}", expanded=False):
@@ -649,7 +782,7 @@ def main():
                 st.markdown(f"**신뢰도:** {qa['confidence_score']:.2f}")
                 
                 # 자동 생성 표시
-                if qa.get('recommendation_data', {}).get('auto_generated'):
+                if (qa.get('recommendation_data') or {}).get('auto_generated'):
                     st.markdown("🤖 *자동 생성됨*")
     
     # 메인 컨텐츠
@@ -782,7 +915,7 @@ def main():
                             st.markdown("---")
                 
                 # 제품 특징 정보
-                rec_data = best_qa.get('recommendation_data', {})
+                rec_data = best_qa.get('recommendation_data') or {}
                 if isinstance(rec_data, dict) and rec_data.get('key_features'):
                     st.markdown("**🔖 주요 특징:**")
                     features_text = " • ".join(rec_data['key_features'])
@@ -807,7 +940,7 @@ def main():
             st.metric("평균 관련성", f"{avg_relevance:.1f}")
         
         # 자동 생성 통계
-        auto_generated_count = sum(1 for qa in qa_results if qa.get('recommendation_data', {}).get('auto_generated'))
+        auto_generated_count = sum(1 for qa in qa_results if (qa.get('recommendation_data') or {}).get('auto_generated'))
         if auto_generated_count > 0:
             st.info(f"🤖 이 중 {auto_generated_count}개는 새로 자동 생성된 정보입니다.")
         
@@ -823,7 +956,7 @@ def main():
                     with col_qa_header1:
                         st.markdown(f"**제품:** {qa['product_name']} ({qa.get('brand', 'N/A')})")
                     with col_qa_header2:
-                        if qa.get('recommendation_data', {}).get('auto_generated'):
+                        if (qa.get('recommendation_data') or {}).get('auto_generated'):
                             st.markdown("🤖 자동생성")
                         else:
                             st.markdown("✅ 기존데이터")
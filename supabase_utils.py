@@ -0,0 +1,80 @@
+"""
+Supabase 클라이언트 공유 모듈
+프로세스 전체에서 하나의 PostgREST 커넥션 풀(keep-alive)을 재사용
+"""
+
+import os
+import threading
+import logging
+from typing import Optional
+
+import httpx
+from supabase import create_client, Client, ClientOptions
+
+logger = logging.getLogger(__name__)
+
+# PostgREST 커넥션 풀 설정 (Supabase 동시 연결 제한 고려)
+POOL_MAX_CONNECTIONS = 20
+POOL_KEEPALIVE_EXPIRY = 30.0
+
+# PostgREST 요청 타임아웃 (초, supabase-py 기본값과 동일)
+POSTGREST_TIMEOUT = 120.0
+
+# 연결 수립 실패(ConnectError/ConnectTimeout) 재시도 횟수
+CONNECT_RETRIES = 2
+
+# 재사용한 keep-alive 연결이 이미 끊겨 있을 때 멱등 요청 재전송 횟수
+STALE_CONNECTION_RETRIES = 1
+
+# 다시 보내도 결과가 같은 HTTP 메서드 (PostgREST insert/upsert/RPC의 POST는 제외)
+IDEMPOTENT_METHODS = frozenset({'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'})
+
+class StaleConnectionRetryTransport(httpx.HTTPTransport):
+    """끊어진 keep-alive 연결로 보낸 멱등 요청을 새 연결로 다시 보내는 전송 계층"""
+    
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        retries = STALE_CONNECTION_RETRIES if request.method in IDEMPOTENT_METHODS else 0
+        
+        for attempt in range(retries + 1):
+            try:
+                return super().handle_request(request)
+            except (httpx.RemoteProtocolError, httpx.ReadError) as e:
+                if attempt == retries:
+                    raise
+                logger.debug(f"끊어진 연결로 요청 실패, 재전송: {request.method} {request.url.path} - {e}")
+
+_client: Optional[Client] = None
+_client_lock = threading.Lock()
+
+def create_pooled_client(supabase_url: str, supabase_key: str) -> Client:
+    """keep-alive 커넥션 풀을 사용하는 Supabase 클라이언트 생성"""
+    # 클라이언트 옵션으로 전달해야 인증 이벤트로 PostgREST 클라이언트가 다시 만들어져도 같은 풀 사용
+    http_client = httpx.Client(
+        timeout=POSTGREST_TIMEOUT,
+        follow_redirects=True,
+        transport=StaleConnectionRetryTransport(
+            retries=CONNECT_RETRIES,
+            limits=httpx.Limits(
+                max_connections=POOL_MAX_CONNECTIONS,
+                max_keepalive_connections=POOL_MAX_CONNECTIONS,
+                keepalive_expiry=POOL_KEEPALIVE_EXPIRY
+            )
+        )
+    )
+    
+    return create_client(supabase_url, supabase_key, options=ClientOptions(httpx_client=http_client))
+
+def get_supabase_client() -> Client:
+    """프로세스 공용 Supabase 클라이언트 (환경 변수 기반, 최초 호출 시 생성)"""
+    global _client
+
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = create_pooled_client(
+                    os.environ.get("SUPABASE_URL"),
+                    os.environ.get("SUPABASE_KEY")
+                )
+                logger.info("Supabase 공용 클라이언트 생성 완료")
+
+    return _client